@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+BOARD_SIZE = 19
+COLUMNS = "ABCDEFGHJKLMNOPQRST"
+# one slot per board point plus pass.
+POINTS = [f"{col}{row}" for row in range(1, BOARD_SIZE + 1) for col in COLUMNS] + ["pass"]
+POINT_INDEX = {point: i for i, point in enumerate(POINTS)}
+
+# rows of a stats array, everything but visits is stored visit-weighted.
+VISITS, WINRATE, SCORE, ORDER = range(4)
+
+
+class MoveAggregator:
+    """Visit-weighted merge of the latest analysis of every engine.
+
+    Engine weights only decide the move, budgets and early stops count the visits engines searched.
+    """
+
+    def __init__(self) -> None:
+        self.engine_stats: dict = {}
+        self.engine_weights: dict = {}
+        self.total = np.zeros((4, len(POINTS)))
+        # unweighted visits per point.
+        self.visits = np.zeros(len(POINTS))
+
+    def reset(self):
+        self.engine_stats = {}
+        self.engine_weights = {}
+        self.total[:] = 0
+        self.visits[:] = 0
+
+    def scatter(self, analysis: dict) -> np.ndarray:
+        stats = np.zeros((4, len(POINTS)))
+        infos = [info for move, info in analysis.items() if move in POINT_INDEX]
+        if not infos:
+            return stats
+        index = np.fromiter((POINT_INDEX[info.move] for info in infos), dtype=np.intp, count=len(infos))
+        values = np.array(
+            [(info.visits, info.winrate, info.scoreLead, info.order) for info in infos],
+            dtype=float,
+        ).T
+        values[1:] *= values[VISITS]
+        np.add.at(stats, (slice(None), index), values)
+        return stats
+
+    def update(self, engine_id: str, analysis: dict, weight: float = 1.0):
+        """Replace the contribution of engine_id with its latest analysis,
+        every visit of engine_id counts weight times."""
+        self.engine_stats[engine_id] = self.scatter(analysis)
+        self.engine_weights[engine_id] = weight
+        # re-summing a handful of engines is cheap and never drifts.
+        self.total = sum(
+            stats * self.engine_weights[engine_id]
+            for engine_id, stats in self.engine_stats.items()
+        )
+        self.visits = sum(stats[VISITS] for stats in self.engine_stats.values())
+
+    @property
+    def total_visits(self) -> int:
+        return int(self.visits.sum())
+
+    def engine_visits(self, engine_id: str) -> int:
+        stats = self.engine_stats.get(engine_id)
+        return 0 if stats is None else int(stats[VISITS].sum())
+
+    def leading_visits(self):
+        """Unweighted visits of the two most visited moves."""
+        second, best = np.partition(self.visits, -2)[-2:]
+        return int(best), int(second)
+
+    def best(self):
+        """Move with the lowest average order (ties go to more visits),
+        with its average winrate and scoreLead."""
+        return best_move(self.total)
+
+    def engine_best(self, engine_id: str):
+        """Best move of engine_id on its own."""
+        stats = self.engine_stats.get(engine_id)
+        return (None, None, None) if stats is None else best_move(stats)
+
+
+def best_move(stats: np.ndarray):
+    visits = stats[VISITS]
+    played = visits > 0
+    if not played.any():
+        return None, None, None
+    avg_order = np.full(len(POINTS), np.inf)
+    avg_order[played] = stats[ORDER, played] / visits[played]
+    i = int(np.lexsort((-visits, avg_order))[0])
+    winrate = stats[WINRATE, i] / visits[i]
+    scoreLead = stats[SCORE, i] / visits[i]
+    return POINTS[i], float(winrate), float(scoreLead)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# kata-analyze fields the pipe consumes, everything else on the line is skipped.
+FIELDS = ("visits", "winrate", "scoreLead", "order")
+
+
+class MoveInfo:
+    __slots__ = ("move", "visits", "winrate", "scoreLead", "order")
+
+    def __init__(self, move: str, visits: int, winrate: float, scoreLead: float, order: int) -> None:
+        self.move = move
+        self.visits = visits
+        self.winrate = winrate
+        self.scoreLead = scoreLead
+        self.order = order
+
+    def __repr__(self) -> str:
+        return (
+            f"MoveInfo({self.move}, visits={self.visits}, winrate={self.winrate}, "
+            f"scoreLead={self.scoreLead}, order={self.order})"
+        )
+
+
+def parse_analysis(line: str) -> dict:
+    """Parse one kata-analyze output line into {move: MoveInfo}."""
+    infos = {}
+    for chunk in line.split("info move ")[1:]:
+        # key/value pairs end where the variable length pv starts.
+        tokens = chunk.split(" pv ", 1)[0].split()
+        move = tokens[0]
+        keys = tokens[1::2]
+        values = tokens[2::2]
+        visits = winrate = scoreLead = order = None
+        for key, value in zip(keys, values):
+            if key == "visits":
+                visits = int(value)
+            elif key == "winrate":
+                winrate = float(value)
+            elif key == "scoreLead":
+                scoreLead = float(value)
+            elif key == "order":
+                order = int(value)
+        infos[move] = MoveInfo(move, visits, winrate, scoreLead, order)
+    return infos
+
+
+def parse_move_infos(move_infos: list, flip: bool = False) -> dict:
+    """Parse the moveInfos of a KataGo analysis engine response into {move: MoveInfo}.
+
+    flip turns winrate and scoreLead around, for responses reported from the other side.
+    """
+    infos = {}
+    for info in move_infos:
+        winrate, scoreLead = info["winrate"], info["scoreLead"]
+        if flip:
+            winrate, scoreLead = 1 - winrate, -scoreLead
+        move = info["move"]
+        infos[move] = MoveInfo(move, info["visits"], winrate, scoreLead, info["order"])
+    return infos
@@ -0,0 +1,148 @@
+import itertools
+import json
+import os
+import shlex
+import time
+
+from analysis import parse_move_infos
+from config import config
+from gameState import GameState, opponent, split_command
+from localEngine import LocalEngine
+from profiler import profiler
+
+local_config = config["LOCAL"]
+engine_config = config["ANALYSIS"]
+USER_FOLDER = local_config.get("katago_folder")
+
+
+class AnalysisEngine(LocalEngine):
+    """Runs KataGo's JSON analysis engine behind the gtp commands the pipe sends.
+
+    Position commands only update a GameState. kata-analyze becomes a query for
+    that position, reported during the search, and any other command terminates
+    it, the way any command stops kata-analyze.
+    """
+
+    def __init__(self, engine_id="a") -> None:
+        super().__init__()
+        self.engine_id = engine_id
+        self.game_state = GameState()
+        self.query_ids = itertools.count(1)
+        # id of the query whose reports are published, None when none runs.
+        self.query_id = None
+        # the analysis engine reports winrates from this side, see reportAnalysisWinratesAs.
+        self.report_as = engine_config.get("report_winrates_as", "BLACK").upper()
+        self.player = None
+
+    def set_command(self):
+        exe_file = local_config.get("exe", "katago.exe")
+        exe = os.path.expanduser(os.path.join(USER_FOLDER, exe_file))
+
+        cfg_file_name = engine_config.get("analysis_config_file", "analysis.cfg")
+        cfg_file = os.path.expanduser(os.path.join(USER_FOLDER, cfg_file_name))
+
+        model_name = local_config.get("model", "b40.bin.gz")
+        model_file = os.path.expanduser(os.path.join(USER_FOLDER, model_name))
+
+        self.command = shlex.split(f'"{exe}" analysis -model "{model_file}" -config "{cfg_file}"')
+
+    def analyze(self, player, interval=50, max_visits=None, priority=0, generation=None):
+        command = f"kata-analyze {player} {interval}"
+        if max_visits:
+            command += f" maxVisits {max_visits}"
+        self.send(f"{command} priority {priority}", generation)
+
+    def send_command(self, command):
+        # the command queue joins runs of play commands with newlines.
+        for line in command.splitlines():
+            self.send_gtp_command(line)
+
+    def send_gtp_command(self, command):
+        cmd_id, name, args = split_command(command)
+        if cmd_id:
+            # commands take effect as they are handled here, no response to wait for.
+            self.acknowledge(cmd_id)
+        if name == "quit":
+            self.katago_process.stdin.close()
+            return
+
+        self.terminate()
+        if name == "kata-analyze":
+            self.submit(args)
+        elif cmd_id in self.queries:
+            # not a gtp engine, let the pool ask the next one.
+            self.queries.pop(cmd_id)[0].set()
+        else:
+            self.game_state.update(command)
+
+    def submit(self, args):
+        player = args[0].lower()[0]
+        options = dict(zip(args[2::2], args[3::2]))
+        state = self.game_state
+        stones = []
+        for setup in state.setup:
+            name, *vertices = setup.split()
+            if name != "set_free_handicap":
+                self.logger.warning(f"{self.engine_id} can not replay {name}, analysing without it")
+                continue
+            stones.extend(["B", vertex] for vertex in vertices)
+        moves = [[color.upper()[0], move] for color, move in state.moves]
+        if moves and moves[-1][0].lower() == player:
+            # the analysis engine alternates colors, a pass hands the turn back.
+            moves.append([opponent(player).upper(), "pass"])
+
+        self.query_id = f"{self.engine_id}-{next(self.query_ids)}"
+        self.player = player
+        self.search_started = time.time()
+        query = {
+            "id": self.query_id,
+            "initialStones": stones,
+            "moves": moves,
+            "rules": state.rules or engine_config.get("rules", "tromp-taylor"),
+            "boardXSize": state.boardsize,
+            "boardYSize": state.boardsize,
+            "reportDuringSearchEvery": int(args[1]) / 100 if len(args) > 1 else 0.5,
+            "priority": int(options.get("priority", 0)),
+        }
+        if not moves:
+            query["initialPlayer"] = player.upper()
+        if state.komi is not None:
+            query["komi"] = state.komi
+        if "maxVisits" in options:
+            query["maxVisits"] = int(options["maxVisits"])
+        self.write(query)
+
+    def terminate(self):
+        if self.query_id is None:
+            return
+        query_id, self.query_id = self.query_id, None
+        self.write({"id": f"{query_id}-stop", "action": "terminate", "terminateId": query_id})
+
+    def write(self, message: dict):
+        super().send_command(json.dumps(message, separators=(",", ":")))
+
+    def process_line(self, line: str):
+        self.bytes_received += len(line) + 1
+        if not line.startswith("{"):
+            if line:
+                self.logger.debug(f"{self.engine_id}: {line}")
+            return
+        try:
+            start = time.perf_counter()
+            response = json.loads(line)
+            if "error" in response:
+                self.logger.error(f"{self.engine_id} rejected {response.get('id')}: {response['error']}")
+                if response.get("id") == self.query_id:
+                    # e.g. an illegal move, the position of the query is never analysed.
+                    self.failed_generation, self.generation = self.generation, None
+            elif "warning" in response:
+                self.logger.warning(f"{self.engine_id}: {response['warning']}")
+            elif response.get("id") == self.query_id and "moveInfos" in response:
+                flip = self.report_as in ("B", "BLACK", "W", "WHITE") and (
+                    self.report_as[0].lower() != self.player
+                )
+                analysis = parse_move_infos(response["moveInfos"], flip)
+                profiler.record("parse", time.perf_counter() - start)
+                self.publish_analysis(analysis)
+        except Exception as e:
+            self.logger.error(f"Unexpected exception {e} while processing Engine output {line[:20]}")
@@ -0,0 +1,240 @@
+import asyncio
+import concurrent.futures
+import subprocess
+import threading
+
+from engine import GtpEngine
+from localEngine import LocalEngine
+from ikatagoEngine import IkatagoEngine
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+# longest line read from a local engine, kata-analyze with ownership sends lines of hundreds of KiB.
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """The single loop every async engine runs on, started on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, daemon=True, name="engine-loop"
+            )
+            _loop_thread.start()
+    return _loop
+
+
+def run_in_loop(func, timeout: float = 5):
+    """Call func on the loop thread and wait for it, at once when already there."""
+    if threading.current_thread() is _loop_thread:
+        return func()
+    done = concurrent.futures.Future()
+
+    def call():
+        try:
+            done.set_result(func())
+        except Exception as e:
+            done.set_exception(e)
+
+    _loop.call_soon_threadsafe(call)
+    return done.result(timeout)
+
+
+class AsyncLocalEngine(LocalEngine):
+    """LocalEngine driven by the shared event loop instead of its own threads."""
+
+    def start(self):
+        self.loop = event_loop()
+        future = asyncio.run_coroutine_threadsafe(self._start(), self.loop)
+        try:
+            future.result()
+        except Exception as e:
+            self.logger.error(f"Starting {self.engine_id} failed: {e}")
+
+    async def _start(self):
+        self.logger.info(f"Starting {self.engine_id} with {self.command}")
+        kwargs = {}
+        if hasattr(subprocess, "STARTUPINFO"):
+            startupinfo = subprocess.STARTUPINFO()
+            # stop command box popups on win/pyinstaller
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            kwargs["startupinfo"] = startupinfo
+        self.katago_process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            limit=STREAM_LIMIT,
+            **kwargs,
+        )
+        self.loop.create_task(self._read_katago(self.katago_process.stdout))
+        self.loop.create_task(self._drain_stderr(self.katago_process.stderr))
+
+    async def _read_katago(self, stdout: asyncio.StreamReader):
+        while True:
+            try:
+                raw = await stdout.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                raw = e.partial
+            except asyncio.LimitOverrunError as e:
+                # the line is dropped, the reader goes on with the next one.
+                self.logger.error(f"Engine {self.engine_id} sent a line over {STREAM_LIMIT} bytes, skipped it.")
+                await skip_line(stdout, e.consumed)
+                continue
+            except Exception as e:
+                self.logger.error(f"Can not read line: {e}")
+                return
+            if not raw:
+                self.logger.warning(f"Engine {self.engine_id} closed its output.")
+                return
+            self.process_line(raw.decode(errors="replace").rstrip())
+
+    async def _drain_stderr(self, stderr: asyncio.StreamReader):
+        # katago logs to stderr, an unread pipe would eventually block it.
+        while await stderr.read(65536):
+            pass
+
+    def __call__(self, command):
+        self.command_queue.put(command)
+        self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        while batch := self.command_queue.get_batch_nowait():
+            self.send_command("\n".join(batch))
+
+    def send_command(self, command):
+        try:
+            self.katago_process.stdin.write(f"{command}\n".encode())
+        except Exception as e:
+            self.logger.error(f"Exception when sending command {command}, {e}")
+
+    def stop(self):
+        self("quit")
+        self.logger.debug(f"stop engine {self.engine_id}.")
+
+    def is_alive(self, os_error="", exception_if_dead=False) -> bool:
+        ok = self.katago_process is not None and self.katago_process.returncode is None
+        if not ok and exception_if_dead:
+            self.logger.error(f"Engine died unexpectedly, os error: {os_error}")
+        return ok
+
+    def shutdown(self, finish=False):
+        process = self.katago_process
+        if process:
+            self.katago_process = None
+            self.loop.call_soon_threadsafe(process.terminate)
+
+
+async def skip_line(stdout: asyncio.StreamReader, consumed: int):
+    """Discard the rest of a line longer than the reader's limit, consumed bytes of it are buffered."""
+    while True:
+        await stdout.read(consumed)
+        try:
+            await stdout.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        except asyncio.IncompleteReadError:
+            return
+
+
+class AsyncIkatagoEngine(AsyncLocalEngine, IkatagoEngine):
+    """IkatagoEngine driven by the shared event loop."""
+
+
+class AsyncGtpEngine(GtpEngine):
+    """Remote engine whose paramiko channel is watched by the shared event loop.
+
+    Selector loops watch the channel's fileno directly, loops without
+    add_reader (the Windows proactor) read it from the default executor.
+    """
+
+    def start(self):
+        self.loop = event_loop()
+        self._buffer = b""
+        # fd the selector watches, paramiko makes a new pipe when fileno is called after close.
+        self._watched_fd = None
+        self._writer = None
+        self.connect()
+        if self.channel is not None:
+            self.loop.call_soon_threadsafe(self._watch_channel)
+
+    def _watch_channel(self):
+        try:
+            fd = self.channel.fileno()
+            self.loop.add_reader(fd, self._on_channel_readable)
+            self._watched_fd = fd
+        except NotImplementedError:
+            self.loop.create_task(self._read_channel_in_executor())
+
+    def _unwatch_channel(self):
+        if self._watched_fd is not None:
+            self.loop.remove_reader(self._watched_fd)
+            self._watched_fd = None
+
+    def _on_channel_readable(self):
+        if self.channel.recv_ready():
+            data = self.channel.recv(65536)
+        elif self.channel.closed or self.channel.eof_received:
+            data = b""
+        else:
+            return
+        if not data:
+            self._unwatch_channel()
+            self.logger.warning(f"Engine {self.engine_id} closed its output.")
+            return
+        *lines, self._buffer = (self._buffer + data).split(b"\n")
+        for raw in lines:
+            self.process_line(raw.decode(errors="replace").rstrip())
+
+    async def _read_channel_in_executor(self):
+        while self.is_alive():
+            try:
+                raw = await self.loop.run_in_executor(None, self.stdout.readline)
+            except (OSError, EOFError) as e:
+                self.logger.error(f"Can not read line: {e}")
+                return
+            if not raw:
+                self.logger.warning(f"Engine {self.engine_id} closed its output.")
+                return
+            self.process_line(raw.decode(errors="replace").rstrip())
+
+    def __call__(self, command):
+        self.command_queue.put(command)
+        self.loop.call_soon_threadsafe(self._start_writer)
+
+    def _start_writer(self):
+        # one writer per engine keeps its commands in order.
+        if self._writer is None or self._writer.done():
+            self._writer = self.loop.create_task(self._drain())
+
+    async def _drain(self):
+        while batch := self.command_queue.get_batch_nowait():
+            command = "\n".join(batch)
+            try:
+                # sendall blocks while the ssh window is full, the loop reading every engine must not.
+                await self.loop.run_in_executor(None, self.send_command, command)
+            except Exception as e:
+                self.logger.error(
+                    f"Exception in processing command {command} with Engine {self.engine_id}:\n{e}"
+                )
+
+    def stop(self):
+        # a closed fd left in the selector is never read again once a reconnect reuses its number.
+        if self.channel is None:
+            return
+        channel = self.channel
+
+        def close():
+            self._unwatch_channel()
+            channel.close()
+
+        try:
+            run_in_loop(close)
+        except Exception as e:
+            self.logger.error(f"Exception when stopping {self.engine_id}: {e}")
+            channel.close()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# Compare the kata-analyze line parser with the old DataFrame path.
+# usage: python benchmarks/bench_parser.py [kata_analyze_output.txt] [repeat]
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from analysis import parse_analysis
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "kata_analyze.txt")
+
+
+def analysis_to_df(analysis: str):
+    # the DataFrame path engines used before analysis.parse_analysis.
+    import pandas as pd
+
+    # key/value pairs up to the pv, current KataGo adds edgeVisits and weight to the old 24 tokens.
+    moves = [move.split(" pv ")[0].split() for move in analysis.split("info ") if move]
+
+    def list_to_dict(lst):
+        i = iter(lst)
+        return dict(zip(i, i))
+
+    records = [list_to_dict(move) for move in moves]
+    df = pd.DataFrame.from_records(records, index="move").astype("float")
+    return df
+
+
+def load_lines(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.startswith("info move")]
+
+
+def bench(name, func, lines, repeat):
+    total = min(timeit.repeat(lambda: [func(line) for line in lines], number=1, repeat=repeat))
+    per_line = total / len(lines) * 1e6
+    print(f"{name:<16} {per_line:10.1f} us/line")
+    return per_line
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    lines = load_lines(path)
+    print(f"{len(lines)} lines from {path}")
+
+    parser = bench("parse_analysis", parse_analysis, lines, repeat)
+    try:
+        dataframe = bench("analysis_to_df", analysis_to_df, lines, repeat)
+    except ImportError:
+        print("pandas not installed, skipping the DataFrame path")
+        return
+    print(f"speedup          {dataframe / parser:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# Drive GtpPipe through full games against fake engines and report where the time goes.
+# usage: python benchmarks/bench_pipe.py [--local N] [--remote N] [--games N] [--moves N] ...
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aggregator import COLUMNS, MoveAggregator
+from analysis import parse_analysis
+from fakeEngines import FakeAnalysisEngine, FakeLocalEngine, FakeRemoteEngine
+from fakeKatago import DATA_FILE, load_frames
+from gtpPipe import GtpPipe
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class ResponseCollector:
+    """Stands in for sys.stdout, GtpPipe prints its responses here."""
+
+    def __init__(self) -> None:
+        self.ready = threading.Condition()
+        self.responses: dict = {}
+        self.buffer = ""
+
+    def write(self, text):
+        with self.ready:
+            self.buffer += text
+            *lines, self.buffer = self.buffer.split("\n")
+            for line in lines:
+                if line.startswith(("=", "?")):
+                    cmd_id, _, rest = line[1:].partition(" ")
+                    self.responses[cmd_id] = (time.perf_counter(), rest.strip())
+            self.ready.notify_all()
+
+    def flush(self):
+        pass
+
+    def wait(self, cmd_id, timeout):
+        with self.ready:
+            self.ready.wait_for(lambda: cmd_id in self.responses, timeout)
+            return self.responses.pop(cmd_id, None)
+
+
+def process_cpu(pid):
+    """utime + stime of pid in seconds, None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {"p50": samples[0], "p90": samples[0], "p99": samples[0]} if samples else {}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98]}
+
+
+def bench_parser_and_aggregator(frames, engines=4, repeat=5):
+    parse = min(timeit.repeat(lambda: [parse_analysis(f) for f in frames], number=1, repeat=repeat))
+    parsed = [parse_analysis(f) for f in frames]
+    aggregator = MoveAggregator()
+
+    def aggregate():
+        for i, analysis in enumerate(parsed):
+            aggregator.update(str(i % engines), analysis)
+            aggregator.best()
+
+    aggregate_time = min(timeit.repeat(aggregate, number=1, repeat=repeat))
+    return len(frames) / parse, len(parsed) / aggregate_time
+
+
+def play_game(pipe, collector, args, rng, ids):
+    def send(command):
+        cmd_id = str(next(ids))
+        pipe(f"{cmd_id} {command}")
+        return cmd_id
+
+    for command in ("boardsize 19", "clear_board", "komi 7.5", f"time_settings 0 {args.byo_yomi} 1"):
+        collector.wait(send(command), 5)
+    pipe(f"set_top_visits {args.top_visits}")
+
+    latencies = []
+    empty = [f"{col}{row}" for col in COLUMNS for row in range(1, 20)]
+    rng.shuffle(empty)
+    for i in range(args.moves):
+        if i % 2 == 0:
+            sent = time.perf_counter()
+            response = collector.wait(send("genmove b"), args.byo_yomi * 3)
+            if response is None:
+                print("genmove timed out", file=sys.__stdout__)
+                continue
+            latencies.append(response[0] - sent)
+            move = response[1].upper()
+            if move in empty:
+                empty.remove(move)
+        else:
+            collector.wait(send(f"play w {empty.pop()}"), 5)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end genmove latency with fake engines")
+    parser.add_argument("--local", type=int, default=1, help="fake KataGo subprocesses")
+    parser.add_argument("--remote", type=int, default=2, help="in-process fake SSH engines")
+    parser.add_argument("--analysis", type=int, default=0, help="fake json analysis engine subprocesses")
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--moves", type=int, default=40)
+    parser.add_argument("--top-visits", type=int, default=40000)
+    parser.add_argument("--byo-yomi", type=float, default=5)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--visit-scale", type=float, default=1.0)
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = load_frames(args.data, args.visit_scale)
+    parse_rate, aggregate_rate = bench_parser_and_aggregator(frames)
+
+    def create_engine(engine_id):
+        if engine_id.startswith("L"):
+            return FakeLocalEngine(engine_id, args.data, args.jitter, args.visit_scale)
+        if engine_id.startswith("A"):
+            return FakeAnalysisEngine(engine_id, args.data, args.jitter, args.visit_scale)
+        return FakeRemoteEngine(engine_id, args.data, args.jitter, args.visit_scale)
+
+    collector = ResponseCollector()
+    sys.stdout = collector
+    pipe = GtpPipe([], local=False)
+    pipe.cache = None
+    pipe.pool.create_engine = create_engine
+    engine_ids = (
+        [f"L{i}" for i in range(args.local)]
+        + [f"R{i}" for i in range(args.remote)]
+        + [f"A{i}" for i in range(args.analysis)]
+    )
+    for engine_id in engine_ids:
+        pipe.append_engine(engine_id)
+    while len(pipe.engines) < len(engine_ids):
+        time.sleep(0.05)
+
+    subprocesses = {
+        engine.engine_id: engine.katago_process.pid
+        for engine in pipe.engines
+        if getattr(engine, "katago_process", None)
+    }
+    cpu_before = {engine_id: process_cpu(pid) for engine_id, pid in subprocesses.items()}
+    pipe_cpu = time.process_time()
+    wall = time.perf_counter()
+
+    rng = random.Random(args.seed)
+    ids = iter(range(1, 10 ** 9))
+    latencies = []
+    for _ in range(args.games):
+        latencies.extend(play_game(pipe, collector, args, rng, ids))
+
+    wall = time.perf_counter() - wall
+    pipe_cpu = time.process_time() - pipe_cpu
+    sys.stdout = sys.__stdout__
+
+    print(f"engines          {', '.join(engine_ids)}")
+    print(f"genmoves         {len(latencies)} in {wall:.1f}s")
+    if latencies:
+        stats = percentiles(latencies)
+        print(
+            f"genmove latency  mean {statistics.mean(latencies):.3f}s  "
+            + "  ".join(f"{name} {value:.3f}s" for name, value in stats.items())
+            + f"  max {max(latencies):.3f}s"
+        )
+    print(f"parser           {parse_rate:,.0f} lines/s")
+    print(f"aggregator       {aggregate_rate:,.0f} updates/s")
+    print(f"pipe process CPU {pipe_cpu / wall:.1%} (includes in-process remote fakes)")
+    for engine_id, pid in subprocesses.items():
+        after = process_cpu(pid)
+        if after is None or cpu_before[engine_id] is None:
+            continue
+        print(f"engine {engine_id:<9} {(after - cpu_before[engine_id]) / wall:.1%} CPU")
+
+
+if __name__ == "__main__":
+    main()
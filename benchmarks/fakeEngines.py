@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Engines that run benchmarks/fakeKatago.py instead of KataGo.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from commandQueue import CommandQueue
+from engine import GtpEngine, logger
+from analysisEngine import AnalysisEngine
+from localEngine import LocalEngine
+from fakeKatago import DATA_FILE, FakeTransport, load_frames, start_fake_channel
+
+FAKE_KATAGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakeKatago.py")
+
+
+class FakeLocalEngine(LocalEngine):
+    """LocalEngine running fakeKatago.py as its subprocess."""
+
+    def __init__(self, engine_id="0", data=DATA_FILE, jitter=0.0, visit_scale=1.0) -> None:
+        super().__init__()
+        self.engine_id = engine_id
+        self.command = [
+            sys.executable, FAKE_KATAGO,
+            "--data", data,
+            "--jitter", str(jitter),
+            "--visit-scale", str(visit_scale),
+        ]
+
+
+class FakeAnalysisEngine(AnalysisEngine):
+    """AnalysisEngine running fakeKatago.py --analysis as its subprocess."""
+
+    def __init__(self, engine_id="a", data=DATA_FILE, jitter=0.0, visit_scale=1.0) -> None:
+        super().__init__(engine_id)
+        self.report_as = "SIDETOMOVE"
+        self.command = [
+            sys.executable, FAKE_KATAGO,
+            "--analysis",
+            "--data", data,
+            "--jitter", str(jitter),
+            "--visit-scale", str(visit_scale),
+        ]
+
+
+class FakeRemoteEngine(GtpEngine):
+    """GtpEngine whose SSH channel is an in-process fake KataGo."""
+
+    def __init__(self, engine_id, data=DATA_FILE, jitter=0.0, visit_scale=1.0) -> None:
+        self.engine_id = engine_id
+        self.frames = load_frames(data, visit_scale)
+        self.jitter = jitter
+        self.command = "fakeKatago"
+
+        self.command_queue = CommandQueue()
+
+        self.read_katago_thread = None
+        self.command_loop_thread = None
+        self.logger = logger
+        self.transport = None
+        self.channel = None
+        self.stdout = None
+
+        self.init_state()
+
+    def connect(self):
+        self.transport = FakeTransport()
+        self.channel = start_fake_channel(self.frames, self.jitter)
+        self.stdout = self.channel.makefile("rb")
+
+    def stop(self):
+        self.transport.authenticated = False
+        self.channel.close()
+        self.command_queue.close()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+# A fake KataGo gtp engine replaying kata-analyze output from a file.
+# usage: python benchmarks/fakeKatago.py [--data file] [--jitter seconds] [--visit-scale x] [--analysis]
+#
+# As a script it speaks gtp on stdin/stdout, so a LocalEngine can run it,
+# or with --analysis the json protocol of the analysis engine.
+# FakeRemoteEngine runs the same replay in-process behind a socket that
+# stands in for the paramiko channel of a GtpEngine.
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from queue import Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from analysis import parse_analysis
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "kata_analyze.txt")
+VISITS = re.compile(r"\b(visits|edgeVisits) (\d+)")
+
+
+# 19x19 handicap points in katago's order.
+HANDICAP = ["D4", "Q16", "D16", "Q4", "D10", "Q10", "K4", "K16", "K10"]
+
+
+def load_frames(path=DATA_FILE, visit_scale=1.0):
+    with open(path) as f:
+        frames = [line.strip() for line in f if line.startswith("info move")]
+    if visit_scale != 1.0:
+        scale = lambda m: f"{m.group(1)} {max(1, int(int(m.group(2)) * visit_scale))}"
+        frames = [VISITS.sub(scale, frame) for frame in frames]
+    return frames
+
+
+class FakeKatago:
+    """Answers gtp commands read from readline and writes replies with write.
+
+    kata-analyze replays the frames from the start at the requested
+    interval plus up to jitter seconds, until the next command arrives.
+    """
+
+    def __init__(self, frames, readline, write, jitter=0.0, seed=None) -> None:
+        self.frames = frames
+        self.readline = readline
+        self.write = write
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.commands = Queue()
+
+    def run(self):
+        threading.Thread(target=self._read_thread, daemon=True).start()
+        while True:
+            command = self.commands.get()
+            if command is None:
+                return
+            tokens = command.split()
+            cmd_id = tokens[0] if tokens and tokens[0].isdigit() else ""
+            if cmd_id:
+                tokens = tokens[1:]
+            name = tokens[0] if tokens else ""
+            if name == "quit":
+                self.write(f"={cmd_id}\n\n")
+                return
+            if name == "kata-analyze":
+                self.analyze(cmd_id, tokens[1:])
+            elif name == "name":
+                self.write(f"={cmd_id} FakeKataGo\n\n")
+            elif name == "version":
+                self.write(f"={cmd_id} 0\n\n")
+            elif name in ("genmove", "kgs-genmove_cleanup"):
+                self.write(f"={cmd_id} {self.frames[-1].split()[2]}\n\n")
+            elif name in ("fixed_handicap", "place_free_handicap"):
+                count = int(tokens[1]) if len(tokens) > 1 else 2
+                self.write(f"={cmd_id} {' '.join(HANDICAP[:count])}\n\n")
+            elif name == "final_score":
+                self.write(f"={cmd_id} W+0.5\n\n")
+            elif name == "showboard":
+                self.write(f"={cmd_id}\n   A B C\n 3 . . .\n 2 . . .\n 1 . . .\n\n")
+            else:
+                self.write(f"={cmd_id}\n\n")
+
+    def _read_thread(self):
+        while True:
+            line = self.readline()
+            if not line:
+                self.commands.put(None)
+                return
+            line = line.decode() if isinstance(line, bytes) else line
+            if line.strip():
+                self.commands.put(line.strip())
+
+    def analyze(self, cmd_id, args):
+        numbers = [arg for arg in args if arg.isdigit()]
+        interval = int(numbers[0]) / 100 if numbers else 1.0
+        maxmoves = int(args[args.index("maxmoves") + 1]) if "maxmoves" in args else 0
+        self.write(f"={cmd_id}\n")
+        i = 0
+        while self.commands.empty():
+            time.sleep(interval + self.random.uniform(0, self.jitter))
+            if not self.commands.empty():
+                break
+            frame = self.frames[min(i, len(self.frames) - 1)]
+            if maxmoves:
+                frame = "info move".join(frame.split("info move")[: maxmoves + 1]).rstrip()
+            self.write(frame + "\n")
+            i += 1
+        self.write("\n")
+
+
+class FakeAnalysisKatago(FakeKatago):
+    """Answers analysis engine queries with the replayed frames as moveInfos.
+
+    Winrates are reported from the side to move, like kata-analyze frames.
+    """
+
+    def run(self):
+        threading.Thread(target=self._read_thread, daemon=True).start()
+        while True:
+            line = self.commands.get()
+            if line is None:
+                return
+            try:
+                query = json.loads(line)
+            except ValueError:
+                self.send({"error": f"could not parse {line[:20]}"})
+                continue
+            if query.get("action") == "terminate":
+                self.send(query)
+            else:
+                self.analyze_query(query)
+
+    def send(self, message):
+        self.write(json.dumps(message) + "\n")
+
+    def analyze_query(self, query):
+        interval = query.get("reportDuringSearchEvery", 1.0)
+        max_visits = query.get("maxVisits")
+        i = 0
+        while self.commands.empty():
+            time.sleep(interval + self.random.uniform(0, self.jitter))
+            if not self.commands.empty():
+                break
+            infos = parse_analysis(self.frames[min(i, len(self.frames) - 1)]).values()
+            done = bool(max_visits) and sum(info.visits for info in infos) >= max_visits
+            move_infos = [
+                {
+                    "move": info.move,
+                    "visits": info.visits,
+                    "winrate": info.winrate,
+                    "scoreLead": info.scoreLead,
+                    "order": info.order,
+                }
+                for info in infos
+            ]
+            self.send({"id": query["id"], "isDuringSearch": not done, "moveInfos": move_infos})
+            if done:
+                return
+            i += 1
+
+
+class FakeTransport:
+    def __init__(self) -> None:
+        self.authenticated = True
+
+    def is_authenticated(self):
+        return self.authenticated
+
+
+class FakeChannel:
+    """The parts of a paramiko Channel a GtpEngine uses, backed by a socket pair."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.closed = False
+        self.eof_received = False
+
+    def makefile(self, mode="r"):
+        return self.sock.makefile(mode)
+
+    def sendall(self, data):
+        self.sock.sendall(data.encode() if isinstance(data, str) else data)
+
+    def recv_ready(self):
+        import select
+
+        return bool(select.select([self.sock], [], [], 0)[0])
+
+    def recv(self, nbytes):
+        data = self.sock.recv(nbytes)
+        if not data:
+            self.eof_received = True
+        return data
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+
+
+def start_fake_channel(frames, jitter=0.0, seed=None) -> FakeChannel:
+    ours, theirs = socket.socketpair()
+    reader = theirs.makefile("rb")
+    lock = threading.Lock()
+
+    def write(text):
+        with lock:
+            try:
+                theirs.sendall(text.encode())
+            except OSError:
+                pass
+
+    fake = FakeKatago(frames, reader.readline, write, jitter, seed)
+    threading.Thread(target=fake.run, daemon=True).start()
+    return FakeChannel(ours)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake KataGo gtp engine")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--visit-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--analysis", action="store_true", help="speak the analysis engine json protocol")
+    args = parser.parse_args()
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    frames = load_frames(args.data, args.visit_scale)
+    fake = FakeAnalysisKatago if args.analysis else FakeKatago
+    fake(frames, sys.stdin.buffer.readline, write, args.jitter, args.seed).run()
+
+
+if __name__ == "__main__":
+    main()
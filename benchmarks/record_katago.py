@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Record kata-analyze output of a real KataGo, to replace the synthetic benchmarks/data/kata_analyze.txt.
+# usage: python benchmarks/record_katago.py katago model.bin.gz gtp.cfg [output] [--frames 40] [--moves "B Q16 W D4"]
+
+import argparse
+import os
+import subprocess
+import sys
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "kata_analyze.txt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record kata-analyze output of KataGo")
+    parser.add_argument("katago")
+    parser.add_argument("model")
+    parser.add_argument("config")
+    parser.add_argument("output", nargs="?", default=DATA_FILE)
+    parser.add_argument("--frames", type=int, default=40)
+    parser.add_argument("--interval", type=int, default=50, help="centiseconds between frames")
+    parser.add_argument("--moves", default="", help="moves played before the analysis, e.g. 'B Q16 W D4'")
+    args = parser.parse_args()
+
+    process = subprocess.Popen(
+        [args.katago, "gtp", "-model", args.model, "-config", args.config],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+    )
+    tokens = args.moves.split()
+    commands = ["boardsize 19", "clear_board", "komi 7.5"]
+    commands += [f"play {color} {move}" for color, move in zip(tokens[::2], tokens[1::2])]
+    to_move = "w" if len(tokens) // 2 % 2 else "b"
+    for command in commands:
+        process.stdin.write(command + "\n")
+    process.stdin.write(f"kata-analyze {to_move} {args.interval}\n")
+
+    frames = []
+    for line in process.stdout:
+        if line.startswith("info move"):
+            frames.append(line.rstrip())
+            print(f"\r{len(frames)}/{args.frames} frames", end="", file=sys.stderr)
+            if len(frames) >= args.frames:
+                break
+    process.stdin.write("quit\n")
+    process.stdin.close()
+    process.wait(10)
+    with open(args.output, "w") as f:
+        f.write("\n".join(frames) + "\n")
+    print(f"\n{len(frames)} frames written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import random
+
+COLUMNS = "ABCDEFGHJKLMNOPQRSTUVWXYZ"
+MAX_SIZE = 25
+# fixed seed, hashes are stored in the persistent position cache.
+_random = random.Random(20201209)
+ZOBRIST = {
+    color: [_random.getrandbits(64) for _ in range(MAX_SIZE * MAX_SIZE)] for color in "bw"
+}
+ZOBRIST_WHITE_TO_MOVE = _random.getrandbits(64)
+
+
+def parse_vertex(vertex: str, size: int):
+    """GTP vertex to (x, y), None for pass."""
+    vertex = vertex.upper()
+    if vertex == "PASS":
+        return None
+    x = COLUMNS.index(vertex[0])
+    y = int(vertex[1:]) - 1
+    if not (0 <= x < size and 0 <= y < size):
+        raise ValueError(f"{vertex} is off a {size}x{size} board")
+    return x, y
+
+
+class Board:
+    """Stones, captures and the Zobrist hash of a position."""
+
+    def __init__(self, size: int = 19) -> None:
+        self.size = size
+        self.stones: dict = {}
+        self.hash = 0
+        # point the next move may not retake, set by a single stone capturing a single stone.
+        self.ko = None
+
+    def neighbours(self, point):
+        x, y = point
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= nx < self.size and 0 <= ny < self.size:
+                yield nx, ny
+
+    def group(self, point):
+        """Stones connected to point and whether the group has a liberty."""
+        color = self.stones[point]
+        stones, frontier, liberty = {point}, [point], False
+        while frontier:
+            for neighbour in self.neighbours(frontier.pop()):
+                stone = self.stones.get(neighbour)
+                if stone is None:
+                    liberty = True
+                elif stone == color and neighbour not in stones:
+                    stones.add(neighbour)
+                    frontier.append(neighbour)
+        return stones, liberty
+
+    def toggle(self, point, color):
+        self.hash ^= ZOBRIST[color][point[1] * MAX_SIZE + point[0]]
+
+    def place(self, color: str, point):
+        self.stones[point] = color
+        self.toggle(point, color)
+
+    def remove(self, stones):
+        for point in stones:
+            self.toggle(point, self.stones.pop(point))
+
+    def play(self, color: str, vertex: str):
+        color = color.lower()[0]
+        point = parse_vertex(vertex, self.size)
+        self.ko = None
+        if point is None:
+            return
+        self.place(color, point)
+        captured = set()
+        for neighbour in self.neighbours(point):
+            if self.stones.get(neighbour) not in (None, color):
+                stones, liberty = self.group(neighbour)
+                if not liberty:
+                    self.remove(stones)
+                    captured |= stones
+        stones, liberty = self.group(point)
+        if not liberty:
+            self.remove(stones)
+        elif len(captured) == 1 and len(stones) == 1 and self.liberties(point) == captured:
+            self.ko = captured.pop()
+
+    def liberties(self, point) -> set:
+        return {neighbour for neighbour in self.neighbours(point) if neighbour not in self.stones}
+
+    def position_hash(self, to_move: str) -> int:
+        if to_move.lower().startswith("w"):
+            return self.hash ^ ZOBRIST_WHITE_TO_MOVE
+        return self.hash
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import threading
+from collections import deque
+
+from gameState import split_command
+
+# commands that keep the engine busy until the next command stops them.
+ANALYZE_COMMANDS = ("kata-analyze", "lz-analyze")
+
+
+def command_name(command: str) -> str:
+    return split_command(command)[1]
+
+
+class CommandQueue:
+    """Commands waiting to be written to one engine, merged where the engine would waste work.
+
+    A queued analysis request is dropped as soon as another command follows it,
+    that command would stop the analysis at once. Consecutive play commands are
+    taken together, so they go out in one write.
+    """
+
+    def __init__(self) -> None:
+        self.commands = deque()
+        self.ready = threading.Condition()
+        # most commands ever waiting, and analysis requests merged away.
+        self.max_depth = 0
+        self.merged = 0
+        # set when the engine stops, wakes the thread waiting in get_batch.
+        self.closed = False
+
+    def put(self, command: str):
+        command = command.strip()
+        with self.ready:
+            if self.commands and command_name(self.commands[-1]) in ANALYZE_COMMANDS:
+                self.commands.pop()
+                self.merged += 1
+            self.commands.append(command)
+            self.max_depth = max(self.max_depth, len(self.commands))
+            self.ready.notify()
+
+    def get_batch(self) -> list:
+        """Wait for the next command, with the play commands right behind a play.
+        An empty batch once the queue is closed."""
+        with self.ready:
+            self.ready.wait_for(lambda: self.commands or self.closed)
+            return self._take() if self.commands else []
+
+    def get_batch_nowait(self) -> list:
+        with self.ready:
+            return self._take() if self.commands else []
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+    def _take(self) -> list:
+        batch = [self.commands.popleft()]
+        if command_name(batch[0]) == "play":
+            while self.commands and command_name(self.commands[0]) == "play":
+                batch.append(self.commands.popleft())
+        return batch
+
+    @property
+    def depth(self) -> int:
+        return len(self.commands)
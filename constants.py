@@ -1,3 +1,5 @@
 #!/usr/bin/env python3
 
 CONFIG_FILE = 'config.ini'
+NAME = 'GoPipe'
+VERSION = '1.0'
@@ -1,16 +1,31 @@
-import paramiko
+import itertools
 import sys
 import threading
-from queue import Queue
+import time
+from collections import deque
 
-import pandas as pd
-
-from logger import logger
+from analysis import parse_analysis
+from commandQueue import CommandQueue
+from gameState import POSITION_COMMANDS
+from logger import get_logger
+from profiler import profiler
 from config import config
 
+logger = get_logger("engine")
+
 engine_config = config["ENGINE"]
 USER_FOLDER = engine_config.get("data_folder")
 
+# ids the pipe gives its own commands, far above the ids controllers send.
+QUERY_IDS = itertools.count(1000000)
+
+pipe_config = config["PIPE"]
+# moves per kata-analyze line, 0 reports all of them.
+ANALYZE_MAXMOVES = pipe_config.getint("analyze_maxmoves", 0)
+# the report interval is stretched to this many round trips of the engine.
+RTT_FACTOR = pipe_config.getfloat("rtt_factor", 0)
+MAX_INTERVAL = pipe_config.getint("max_analyze_interval", 200)
+
 
 class GtpEngine:
     def __init__(self, engine_id: str) -> None:
@@ -23,34 +38,48 @@ class GtpEngine:
         self.password = password
         self.command = "run-katago --transmit-move-num 6 -- gtp -override-config numSearchThreads=32"
 
-        self.command_queue = Queue()
+        self.command_queue = CommandQueue()
 
         self.read_katago_thread = None
         self.command_loop_thread = None
         self.logger = logger
         self.transport = None
+        self.channel = None
+        self.stdout = None
+
+        self.init_state()
 
+    def init_state(self):
+        """Analysis, responses and traffic of the engine, every subclass starts from them."""
         self.analysis = None
+        # shared with the pipe, notified whenever analysis is updated.
+        self.analysis_ready = None
+
+        # query id -> [event set on response, response], see query.
+        self.queries = {}
+        # [query id, success, lines] while a query response is read.
+        self.response = None
+
+        # traffic and round trip of the analysis stream, see traffic.
+        self.bytes_received = 0
+        self.started_at = time.time()
+        self.rtt = None
+        self.analyze_id = None
+        self.analyze_sent = None
+
+        # position generation the engine answered the last command for, its frames are tagged with it.
+        # None after a rejected position command.
+        self.generation = 0
+        self.analysis_generation = None
+        # (id, generation, position command) of commands sent and not answered yet, in order.
+        self.generations = deque()
+        # when the engine answered the latest kata-analyze, its search started then.
+        self.search_started = None
+        # generation of the latest command the engine rejected, it never reaches that position.
+        self.failed_generation = None
 
     def start(self):
-        try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.client.connect(
-                hostname=self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                timeout=5,
-                allow_agent=False,
-                look_for_keys=False,
-            )
-            self.transport = self.client.get_transport()
-            self.channel = self.transport.open_session(timeout=2)
-            self.channel.exec_command(self.command)
-            self.logger.debug(f"Start {self.engine_id} with {self.command}")
-        except Exception as e:
-            self.logger.error(f"Starting {self.engine_id} failed:\n{e}")
+        self.connect()
         self.read_katago_thread = threading.Thread(
             target=self._read_katago_thread, daemon=True
         )
@@ -60,35 +89,162 @@ class GtpEngine:
         )
         self.command_loop_thread.start()
 
+    def connect(self):
+        # imported here, a pipe with only local engines never loads paramiko.
+        from sshPool import transport_pool
+
+        try:
+            # engines on one host share its transport, each runs katago on its own channel.
+            self.transport, self.channel = transport_pool.open_channel(
+                self.host, self.port, self.username, self.password, self.command
+            )
+            # one buffered file for the whole session, reads block until data arrives.
+            self.stdout = self.channel.makefile("rb")
+            self.logger.debug(f"Start {self.engine_id} with {self.command}")
+        except Exception as e:
+            self.logger.error(f"Starting {self.engine_id} failed:\n{e}")
+
     def _read_katago_thread(self):
         while self.is_alive():
-            if not self.channel.recv_ready():
-                continue
             try:
-                line: str = self.channel.makefile().readline().strip()
-            except OSError as e:
+                raw: bytes = self.stdout.readline()
+            except (OSError, EOFError) as e:
                 self.logger.error(f"Can not read line: {e}")
                 return
 
-            if not line:
+            if not raw:
+                self.logger.warning(f"Engine {self.engine_id} closed its output.")
+                return
+
+            self.process_line(raw.decode(errors="replace").rstrip())
+
+    def process_line(self, line: str):
+        self.bytes_received += len(line) + 1
+        if self.response is not None:
+            self.read_response(line)
+            return
+
+        if not line:
+            return
+
+        if line[0] in "=?":
+            query_id = line[1:].split(" ", 1)[0]
+            if query_id in self.queries:
+                self.response = [query_id, line[0] == "=", [line[1 + len(query_id):].strip()]]
+                return
+            if query_id.isdigit():
+                if line[0] == "?":
+                    self.logger.warning(f"{self.engine_id} rejected command {query_id}: {line}")
+                self.acknowledge(query_id, line[0] == "=")
+
+        if "Uncaught exception" in line:
+            self.logger.error(f"Engine Failed: {line}")
+
+        try:
+            if line.startswith("info move"):
+                start = time.perf_counter()
+                analysis = parse_analysis(line)
+                profiler.record("parse", time.perf_counter() - start)
+                self.publish_analysis(analysis)
+        except Exception as e:
+            self.logger.error(
+                f"Unexpected exception {e} while processing Engine output {line[:20]}"
+            )
+
+    def read_response(self, line: str):
+        # a gtp response ends with an empty line.
+        query_id, success, lines = self.response
+        if line.strip():
+            lines.append(line)
+            return
+        self.response = None
+        query = self.queries.pop(query_id, None)
+        if query is not None:
+            query[1] = (success, "\n".join(lines).rstrip())
+            query[0].set()
+
+    def query(self, command: str, timeout: float):
+        """Send command to this engine alone and wait for its response.
+
+        Returns (success, text) with the "=id"/"?id" prefix removed, None on timeout.
+        """
+        query_id = str(next(QUERY_IDS))
+        query = [threading.Event(), None]
+        self.queries[query_id] = query
+        self(f"{query_id} {command}")
+        if not query[0].wait(timeout):
+            self.queries.pop(query_id, None)
+            return None
+        return query[1]
+
+    def acknowledge(self, command_id: str, success: bool = True):
+        """The engine answered command_id, it is at the position of its generation now unless it failed."""
+        # responses come in order, older commands were answered or merged away in the queue.
+        while self.generations and int(self.generations[0][0]) <= int(command_id):
+            sent_id, generation, position = self.generations.popleft()
+            if sent_id != command_id:
                 continue
+            if not success:
+                if position:
+                    # the engine's board misses the command, its frames match no generation until the next one.
+                    self.failed_generation = generation
+                    self.generation = None
+            elif generation != self.failed_generation:
+                self.generation = generation
+        if command_id == self.analyze_id:
+            if success:
+                self.search_started = time.time()
+            rtt = time.perf_counter() - self.analyze_sent
+            self.rtt = rtt if self.rtt is None else 0.8 * self.rtt + 0.2 * rtt
+            self.analyze_id = None
 
-            try:
-                if "info move" in line:
-                    if not line.startswith("info move"):
-                        continue
-                    self.analysis = self.analysis_to_df(line)
-            except Exception as e:
-                self.logger.error(
-                    f"Unexpected exception {e} while processing Engine output {line[:20]}"
-                )
+    def publish_analysis(self, analysis):
+        if self.analysis_ready is None:
+            self.analysis, self.analysis_generation = analysis, self.generation
+            return
+        with self.analysis_ready:
+            self.analysis, self.analysis_generation = analysis, self.generation
+            self.analysis_ready.notify_all()
 
     def __call__(self, command):
         self.command_queue.put(command)
 
+    def send(self, command: str, generation=None, command_id=None) -> str:
+        """Queue command with an id of its own, its response moves the engine to generation."""
+        command_id = command_id or str(next(QUERY_IDS))
+        if generation is not None:
+            self.generations.append((command_id, generation, command.split(" ", 1)[0] in POSITION_COMMANDS))
+        self(f"{command_id} {command}")
+        return command_id
+
+    def analyze(self, player, interval=50, max_visits=None, priority=0, generation=None):
+        # a gtp engine searches until the next command, max_visits and priority are the pipe's business.
+        if self.rtt is not None and RTT_FACTOR:
+            # reports sent faster than the link answers only queue up on it.
+            interval = max(interval, min(int(self.rtt * RTT_FACTOR * 100), MAX_INTERVAL))
+        command = f"kata-analyze {player} {interval}"
+        if ANALYZE_MAXMOVES:
+            command += f" maxmoves {ANALYZE_MAXMOVES}"
+        # its "=" response times the round trip and the start of the search.
+        self.analyze_id, self.analyze_sent = str(next(QUERY_IDS)), time.perf_counter()
+        self.send(command, generation, self.analyze_id)
+
+    def traffic(self) -> dict:
+        """Bytes received, their rate since start and the smoothed round trip in seconds."""
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        return {
+            "bytes": self.bytes_received,
+            "bytes_per_second": self.bytes_received / elapsed,
+            "rtt": self.rtt,
+        }
+
     def _command_loop_thread(self):
         while self.is_alive():
-            command = self.command_queue.get().strip()
+            # a run of play commands goes out in one write.
+            batch = self.command_queue.get_batch()
+            if not batch:
+                return
+            command = "\n".join(batch)
             try:
                 self.send_command(command)
             except Exception as e:
@@ -100,19 +256,16 @@ class GtpEngine:
         self.channel.sendall(f"{command}\n")
 
     def stop(self):
-        self.client.close()
+        # the transport stays open for the other engines and the next reconnect.
+        if self.channel is not None:
+            self.channel.close()
+        self.command_queue.close()
 
     def is_alive(self):
-        return self.transport and self.transport.is_authenticated()
-
-    def analysis_to_df(self, analysis: str) -> pd.DataFrame:
-        moves = [move.strip().split()[:24]
-                 for move in analysis.split("info ") if move]
-
-        def list_to_dict(lst):
-            i = iter(lst)
-            return dict(zip(i, i))
-
-        records = [list_to_dict(move) for move in moves]
-        df = pd.DataFrame.from_records(records, index="move").astype("float")
-        return df
+        return (
+            self.transport is not None
+            and self.transport.is_authenticated()
+            and self.channel is not None
+            and not self.channel.closed
+            and not self.channel.eof_received
+        )
@@ -0,0 +1,255 @@
+import itertools
+import threading
+import time
+
+from logger import get_logger
+from config import config
+
+logger = get_logger("pool")
+
+pipe_config = config["PIPE"]
+
+# seconds between two reconnect attempts grow up to this.
+MAX_BACKOFF = 300
+
+
+class EngineHealth:
+    """Liveness and latency of one engine id, kept across reconnects."""
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.next_retry = 0.0
+        self.misses = 0
+        self.last_analysis = None
+        # seconds from kata-analyze to the first analysis, smoothed over turns.
+        self.latency = None
+
+    def seen(self, latency=None):
+        # an engine that starts but never analyses keeps backing off.
+        self.last_analysis = time.time()
+        self.failures = 0
+        self.misses = 0
+        if latency is not None:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+    def failed(self):
+        self.failures += 1
+        self.next_retry = time.time() + min(2 ** self.failures, MAX_BACKOFF)
+
+    def __repr__(self) -> str:
+        latency = "-" if self.latency is None else f"{self.latency:.2f}s"
+        return f"EngineHealth(failures={self.failures}, misses={self.misses}, latency={latency})"
+
+
+class EnginePool:
+    """Starts engines, keeps them alive and brings recovered ones back to the game.
+
+    sync_commands returns the commands that bring a new engine to the current position.
+    """
+
+    def __init__(self, sync_commands) -> None:
+        self.sync_commands = sync_commands
+        # thread: two threads per engine, asyncio: one event loop for all engines.
+        self.backend = pipe_config.get("backend", "thread")
+        self.health_interval = pipe_config.getfloat("health_interval", 5)
+        # turns without analysis before a connected engine is restarted.
+        self.max_misses = pipe_config.getint("max_misses", 3)
+        # commands waiting for an engine before it gets no analysis requests, and before it is restarted.
+        self.degraded_depth = pipe_config.getint("degraded_queue_depth", 4)
+        self.max_queue_depth = pipe_config.getint("max_queue_depth", 64)
+        self.logger = logger
+
+        self.engines: list = []
+        # ids the pool keeps running, reconnecting them when they die.
+        self.wanted: list = []
+        # ids of engines connecting in the background.
+        self.starting_engines: set = set()
+        self.health: dict = {}
+
+        # held while the game state changes and is broadcast.
+        self.lock = threading.RLock()
+        # engines notify it whenever they publish new analysis.
+        self.analysis_ready = threading.Condition()
+        # position generations of every session using the pool, each number is given once.
+        self.generations = itertools.count(1)
+
+        self.supervisor_thread = threading.Thread(
+            target=self._supervisor_thread, daemon=True
+        )
+        self.supervisor_thread.start()
+
+    def append_engine(self, engine_id):
+        """Start engine_id in the background, it joins self.engines once ready."""
+        with self.lock:
+            if engine_id not in self.wanted:
+                self.wanted.append(engine_id)
+            self.health.setdefault(engine_id, EngineHealth())
+            if engine_id in self.starting_engines or self.get(engine_id):
+                self.logger.warning(f"{engine_id} is already running")
+                return
+            self.starting_engines.add(engine_id)
+        threading.Thread(
+            target=self._start_engine, args=(engine_id,), daemon=True
+        ).start()
+
+    def _start_engine(self, engine_id):
+        health = self.health[engine_id]
+        try:
+            engine = self.create_engine(engine_id)
+            engine.analysis_ready = self.analysis_ready
+            engine.start()
+            if not engine.is_alive():
+                self.logger.error(f"{engine_id} is not alive after start, not appended")
+                health.failed()
+                return
+            # replay and join under the lock, so no command is sent in between.
+            with self.lock:
+                if engine_id not in self.wanted:
+                    engine.stop()
+                    return
+                for cmd in self.sync_commands():
+                    engine(cmd)
+                if engine_id == str(0):
+                    self.engines.insert(0, engine)
+                else:
+                    self.engines.append(engine)
+            health.misses = 0
+            self.logger.info(f"{engine.engine_id} is appended")
+        except Exception as e:
+            health.failed()
+            self.logger.error(f"Exception when start {engine_id}:\n{e}")
+        finally:
+            with self.lock:
+                self.starting_engines.discard(engine_id)
+
+    def create_engine(self, engine_id):
+        if self.backend == "asyncio":
+            from asyncEngine import AsyncGtpEngine, AsyncIkatagoEngine, AsyncLocalEngine
+
+            local, ikatago, remote = AsyncLocalEngine, AsyncIkatagoEngine, AsyncGtpEngine
+        else:
+            # engine modules are imported by the first engine that needs them.
+            from engine import GtpEngine
+            from ikatagoEngine import IkatagoEngine
+            from localEngine import LocalEngine
+
+            local, ikatago, remote = LocalEngine, IkatagoEngine, GtpEngine
+
+        if engine_id == str(0):
+            return local()
+        elif engine_id == 'i':
+            return ikatago()
+        elif engine_id == 'a':
+            # queries are json lines either way, the thread engine serves both backends.
+            from analysisEngine import AnalysisEngine
+
+            return AnalysisEngine(engine_id)
+        return remote(engine_id)
+
+    def get(self, engine_id):
+        for engine in self.engines:
+            if engine.engine_id == engine_id:
+                return engine
+        return None
+
+    def remove(self, engine):
+        with self.lock:
+            if engine in self.engines:
+                self.engines.remove(engine)
+
+    def stop_engine(self, engine_id):
+        with self.lock:
+            if engine_id in self.wanted:
+                self.wanted.remove(engine_id)
+        engine = self.get(engine_id)
+        if engine:
+            self.remove(engine)
+            engine.stop()
+
+    def broadcast(self, command: str, skip=None, generation=None):
+        """Send command to every engine but skip, each with an id tagging it with generation."""
+        with self.lock:
+            for engine in self.engines:
+                if engine is skip:
+                    continue
+                try:
+                    engine.send(command, generation)
+                except Exception as e:
+                    self.logger.error(
+                        f"Exception when sending command {command} to {engine.engine_id}: {e}"
+                    )
+
+    def fastest(self) -> list:
+        """Alive engines, the lowest analysis latency first and unmeasured ones last."""
+        latency = lambda engine: self.health[engine.engine_id].latency
+        with self.lock:
+            engines = [engine for engine in self.engines if engine.is_alive()]
+        return sorted(engines, key=lambda e: (latency(e) is None, latency(e) or 0))
+
+    def first_analysis_latency(self) -> float:
+        """Seconds the fastest measured engine takes to its first analysis, 0 before any is measured."""
+        latencies = [health.latency for health in self.health.values() if health.latency is not None]
+        return min(latencies, default=0.0)
+
+    def query(self, command: str, timeout: float):
+        """(engine, (success, text)) from the fastest engine answering command, (None, None) if none does."""
+        for engine in self.fastest():
+            response = engine.query(command, timeout)
+            if response is not None:
+                return engine, response
+            self.logger.warning(f"{engine.engine_id} did not answer {command} in {timeout}s")
+        return None, None
+
+    def degraded(self, engine, queued=0) -> bool:
+        """The engine's link is backed up, more analysis requests would only queue behind it.
+
+        queued commands were just put in by the caller, they are no sign of a slow link.
+        """
+        return engine.command_queue.depth - queued >= self.degraded_depth
+
+    def hedge(self, engine_ids):
+        """Engines that missed the response deadline, the pipe stops waiting on them."""
+        for engine_id in engine_ids:
+            health = self.health.get(engine_id)
+            if health:
+                health.misses += 1
+        self.logger.warning(f"No analysis in time from {list(engine_ids)}")
+
+    def _supervisor_thread(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_engines()
+            except Exception as e:
+                self.logger.error(f"Exception in engine supervisor: {e}")
+
+    def check_engines(self):
+        for engine in list(self.engines):
+            health = self.health[engine.engine_id]
+            if not engine.is_alive():
+                self.logger.warning(f"Engine {engine.engine_id} stopped.")
+                # its command thread would wait for commands that never come.
+                engine.command_queue.close()
+            elif health.misses >= self.max_misses:
+                self.logger.warning(
+                    f"Engine {engine.engine_id} missed {health.misses} turns, restarting."
+                )
+                engine.stop()
+            elif engine.command_queue.depth >= self.max_queue_depth:
+                # a fresh engine synced from the game state beats replaying the backlog.
+                self.logger.warning(
+                    f"Engine {engine.engine_id} has {engine.command_queue.depth} commands queued, restarting."
+                )
+                engine.stop()
+            else:
+                continue
+            self.remove(engine)
+            health.failed()
+
+        now = time.time()
+        for engine_id in list(self.wanted):
+            if engine_id in self.starting_engines or self.get(engine_id):
+                continue
+            if now >= self.health[engine_id].next_retry:
+                self.logger.info(f"Reconnecting {engine_id}")
+                self.append_engine(engine_id)
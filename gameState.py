@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+from board import COLUMNS, Board
+
+# commands whose latest value is part of the game state, keyed by name and first argument.
+# time_settings is the pipe's own, its time manager plans the engines' time.
+SETTING_COMMANDS = ("kgs-time_settings", "kata-set-rule", "kata-set-param")
+# commands that put stones on an empty board.
+SETUP_COMMANDS = ("fixed_handicap", "place_free_handicap", "set_free_handicap", "loadsgf")
+# commands that change the position an engine searches.
+POSITION_COMMANDS = (
+    "boardsize", "clear_board", "komi", "kata-set-rules", "kata-set-rule", "play", "undo",
+    *SETUP_COMMANDS,
+)
+
+
+def split_command(command: str):
+    """Split a gtp command into (id, name, args), id is None when absent."""
+    tokens = command.split()
+    if tokens and tokens[0].isdigit():
+        return tokens[0], tokens[1] if len(tokens) > 1 else "", tokens[2:]
+    return None, tokens[0] if tokens else "", tokens[1:]
+
+
+def opponent(color: str) -> str:
+    return "w" if color.lower().startswith("b") else "b"
+
+
+class GameState:
+    """Canonical state of the current game, enough to bring a new engine to the position."""
+
+    def __init__(self) -> None:
+        self.boardsize = 19
+        self.komi = None
+        self.rules = None
+        self.settings: dict = {}
+        self.setup: list = []
+        self.moves: list = []
+
+    def clear_board(self):
+        self.setup = []
+        self.moves = []
+
+    def update(self, command: str):
+        _, name, args = split_command(command)
+        if name == "boardsize" and args:
+            self.boardsize = int(args[0])
+            self.clear_board()
+        elif name == "clear_board":
+            self.clear_board()
+        elif name == "komi" and args:
+            self.komi = float(args[0])
+        elif name == "kata-set-rules" and args:
+            self.rules = args[0]
+            # kata-set-rules resets every single rule set before.
+            self.settings = {
+                key: value for key, value in self.settings.items() if key[0] != "kata-set-rule"
+            }
+        elif name == "play" and len(args) >= 2:
+            if args[1].lower() != "resign":
+                self.moves.append((args[0], args[1]))
+        elif name == "undo":
+            if self.moves:
+                self.moves.pop()
+        elif name in SETUP_COMMANDS:
+            if name == "loadsgf":
+                self.clear_board()
+            self.setup.append(" ".join([name, *args]))
+        elif name in SETTING_COMMANDS:
+            key = (name, args[0] if args and name.startswith("kata-set") else "")
+            self.settings[key] = " ".join([name, *args])
+
+    def sync_commands(self) -> list:
+        """The shortest command sequence that brings a fresh engine to the current position."""
+        commands = [f"boardsize {self.boardsize}"]
+        if self.komi is not None:
+            commands.append(f"komi {self.komi}")
+        if self.rules is not None:
+            commands.append(f"kata-set-rules {self.rules}")
+        commands.extend(self.settings.values())
+        commands.append("clear_board")
+        commands.extend(self.setup)
+        commands.extend(f"play {color} {move}" for color, move in self.moves)
+        return commands
+
+    def position_key(self, to_move: str):
+        """Zobrist hash of the position plus komi, rules and the ko point, None when it can not be known."""
+        board = Board(self.boardsize)
+        try:
+            for command in self.setup:
+                name, *vertices = command.split()
+                # stones of the other setup commands are chosen by the engine or a file.
+                if name != "set_free_handicap":
+                    return None
+                for vertex in vertices:
+                    board.play("b", vertex)
+            for color, move in self.moves:
+                board.play(color, move)
+        except ValueError:
+            return None
+        rules = [self.rules or ""] + [
+            value for key, value in self.settings.items() if key[0] == "kata-set-rule"
+        ]
+        key = f"{board.position_hash(to_move):016x}/{self.boardsize}/{self.komi}/{' '.join(rules)}"
+        if board.ko is not None:
+            # the same stones with a retake banned have other legal moves.
+            x, y = board.ko
+            key += f"/ko {COLUMNS[x]}{y + 1}"
+        return key
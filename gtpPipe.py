@@ -1,32 +1,128 @@
+import re
 import sys
 import threading
 import time
+from contextlib import nullcontext
 from queue import Queue
 
-import pandas as pd
-
-from engine import GtpEngine
-from localEngine import LocalEngine
-from ikatagoEngine import IkatagoEngine
-from logger import logger
+from aggregator import POINT_INDEX, MoveAggregator
+from enginePool import EnginePool
+from gameState import POSITION_COMMANDS, SETTING_COMMANDS, GameState, opponent, split_command
+from handshake import HANDSHAKE_COMMANDS, answer_handshake, write_stdout
+from liveFeed import LiveFeed
+from logger import get_logger
+from mergeStrategy import create_merge_strategy
+from positionCache import CacheEntry, PositionCache
+from profiler import profiler
+from telemetry import Telemetry
+from timeManager import TimeManager
 from config import config
 
+logger = get_logger("pipe")
+
 pipe_config = config["PIPE"]
+log_config = config["LOG"]
+
+# commands every engine needs, answered at once and sent to all engines.
+# commands that are neither these nor pipe commands are queries, answered by one engine.
+BROADCAST_COMMANDS = frozenset((*POSITION_COMMANDS, *SETTING_COMMANDS, "kata-analyze", "lz-analyze"))
+# engines serving several searches, the analysis engine, run genmove searches before ponder ones.
+PONDER_PRIORITY = -1
+
+
+def create_telemetry():
+    return Telemetry() if log_config.getboolean("telemetry", True) else None
+
+
+def create_cache():
+    cache_file = pipe_config.get("cache_file", "")
+    if not cache_file:
+        return None
+    return PositionCache(cache_file, pipe_config.getint("cache_size", 100000))
+
+
+def create_live_feed(session_id=None):
+    name = pipe_config.get("live_feed", "")
+    if not name:
+        return None
+    if session_id:
+        # every session of a server has a feed of its own.
+        name += "-" + re.sub(r"[^0-9A-Za-z]+", "-", session_id).strip("-")
+    try:
+        return LiveFeed(name)
+    except (OSError, ValueError) as e:
+        logger.error(f"Can not create live feed {name}: {e}")
+        return None
 
 
 class GtpPipe:
-    def __init__(self, engine_ids=[], local=True) -> None:
+    """One game, played by the merged analysis of its engines.
+
+    With a server the pipe is one session of it, sharing the server's engines
+    with the other sessions through its scheduler.
+    """
+
+    def __init__(self, engine_ids=[], local=True, server=None, output=write_stdout, session_id=None) -> None:
         self.local = local
         self.engine_ids = [str(i) for i in engine_ids]
-        self.engines: list[GtpEngine] = []
         self.message_queue = Queue()
         self.logger = logger
-
+        self.server = server
+        # responses are written with it, a session writes to its own client.
+        self.output = output
+        self.session_id = session_id
+
+        # survives clear_board, late joining engines are synced from it.
+        self.game_state = GameState()
+        # visits/sec measurements survive new games.
+        self.time_manager = TimeManager()
+        # engine trust is learned across games.
+        self.merge_strategy = create_merge_strategy(pipe_config.get("merge_strategy", "equal"))
+        # keep engines analysing the opponent's replies during their turn.
+        # shared engines are busy with the other sessions' turns instead.
+        self.ponder = pipe_config.getboolean("ponder", False) and server is None
+        if server:
+            self.telemetry = server.telemetry
+            self.cache = server.cache
+            self.pool = server.pool
+            self.scheduler = server.scheduler
+        else:
+            self.telemetry = create_telemetry()
+            self.cache = create_cache()
+            self.pool = EnginePool(self.game_state.sync_commands)
+            self.scheduler = None
+        self.live_feed = create_live_feed(session_id)
         self.init_game()
 
-        self._lock = threading.Lock()
+        self.analysis_ready = self.pool.analysis_ready
+        # renewed by every position command, analysis of older generations is stale.
+        # numbers come from the pool, sessions sharing its engines never get the same one.
+        self.generation = next(self.pool.generations)
+        # engine id -> (bytes, time) at the last traffic_stats.
+        self.traffic_marks: dict = {}
         self.message_loop_thread = None
-        self.engine_monitor_thread = None
+
+        # pipe commands answering for themselves, called with (id, args).
+        self.handlers = {
+            "genmove": self.dealing_with_genmove,
+            "kgs-genmove_cleanup": self.dealing_with_genmove_cleanup,
+            "fixed_handicap": lambda cmd_id, args: self.dealing_with_handicap(cmd_id, "fixed_handicap", args),
+            "place_free_handicap": lambda cmd_id, args: self.dealing_with_handicap(
+                cmd_id, "place_free_handicap", args
+            ),
+            "traffic_stats": self.dealing_with_traffic_stats,
+            "gopipe_stats": self.dealing_with_gopipe_stats,
+        }
+        # pipe settings, called with the command arguments.
+        self.pipe_commands = {
+            "set_top_visits": self.set_top_visits,
+            "set_resign_threshold": self.set_resign_threshold,
+            "add_lag_buffer": self.add_lag_buffer,
+            "append_engine": self.append_engine,
+            "stop_engine": self.stop_engine,
+            "time_settings": self.time_manager.set_time_settings,
+            "time_left": self.time_manager.set_time_left,
+        }
 
         self.start()
 
@@ -37,9 +133,10 @@ class GtpPipe:
         self.komi = 7.5
 
         # time related
-        self.lag_buffer = pipe_config.getfloat("lag_buffer", 1)
+        self.time_manager.new_game()
         self.max_time = 13
         self.response_time_limit = pipe_config.getfloat("response_time_limit", 5)
+        self.analyze_interval = pipe_config.getint("analyze_interval", 50)
 
         # turn related
         self.my_turn = None
@@ -53,68 +150,57 @@ class GtpPipe:
         self.resign_consec_turn = pipe_config.getint("resign_consec_turn", 3)
 
         self.analysis: dict = {}
-
-        self.commands_send: list = []
+        self.aggregator = MoveAggregator()
+        self.search_ended = None
+        # sessions of a server share the profiler, only a game of its own resets it.
+        if self.server is None:
+            profiler.reset()
+        if self.live_feed:
+            self.live_feed.publish_history(self.winrates, self.scoreLead)
+
+        # color the engines are pondering for, None when not pondering.
+        self.pondering = None
+        self.ponder_moves = 0
+        self.ponder_hits = 0
 
     def start(self):
+        if self.server:
+            self.local, self.engine_ids = False, []
         if self.local:
-            local_engine = LocalEngine()
-            local_engine.start()
-            self.engines.append(local_engine)
+            self.append_engine(str(0))
 
         for engine_id in self.engine_ids:
             self.append_engine(engine_id)
 
         self.message_loop_thread = threading.Thread(
             target=self._message_loop_thread, daemon=True
-        ).start()
-        self.engine_monitor_thread = threading.Thread(
-            target=self._engine_monitor_thread, daemon=True
-        ).start()
+        )
+        self.message_loop_thread.start()
+
+    @property
+    def engines(self) -> list:
+        return self.pool.engines
 
     def append_engine(self, engine_id):
-        try:
-            if engine_id == str(0):
-                engine = LocalEngine()
-            elif engine_id == 'i':
-                engine = IkatagoEngine()
-            else:
-                engine = GtpEngine(engine_id)
-            engine.start()
-            # sync queue after start, in case there are new cmds during starting.
-            with self._lock:
-                if self.commands_send:
-                    for cmd in self.commands_send:
-                        engine(cmd)
-            if engine_id == str(0):
-                self.engines.insert(0, engine)
-            else:
-                self.engines.append(engine)
-            self.logger.info(f"{engine.engine_id} is appended")
-        except Exception as e:
-            self.logger.error(f"Exception when start {engine_id}:\n{e}")
+        self.pool.append_engine(engine_id)
 
     def stop_engine(self, engine_id):
-        for engine in self.engines:
-            if engine.engine_id == engine_id:
-                engine.stop()
-                self.engines.remove(engine)
+        self.pool.stop_engine(engine_id)
 
     def __call__(self, gtp_command) -> None:
         self.message_queue.put(gtp_command)
 
-    def _engine_monitor_thread(self):
-        while not self.my_turn:
-            for engine in self.engines:
-                if not engine.is_alive():
-                    self.engines.remove(engine)
-                    self.logger.warning(f"Engine {engine.engine_id} stoped.")
-                    # self.append_engine(engine.engine_id)
-            time.sleep(5)
+    def close(self):
+        """Stop the message loop after the queued commands, the engines keep running."""
+        self.message_queue.put(None)
 
     def _message_loop_thread(self):
         while True:
             gtp_command = self.message_queue.get()
+            if gtp_command is None:
+                if self.live_feed:
+                    self.live_feed.close()
+                return
             try:
                 self.logger.debug(f"Message Loop Received {gtp_command}")
                 self.dealing_with_command(gtp_command)
@@ -122,99 +208,95 @@ class GtpPipe:
                 self.logger.error(f"Exception in processing message {gtp_command}: {e}")
 
     def dealing_with_command(self, command):
-        if "genmove" in command:
-            self.dealing_with_genmove(command)
+        # gtp ignores comments and blank lines, they get no response.
+        command = command.split("#", 1)[0].strip()
+        if not command:
             return
+        cmd_id, name, args = split_command(command)
+        cmd_id = cmd_id or ""
 
-        if "set_top_visits" in command:
-            try:
-                _, value = command.split()
-                value = int(value)
-                self.set_top_visits(value)
-            except Exception as e:
-                self.logger.error(f"Exception when dealing command {command}: {e}")
+        if name in HANDSHAKE_COMMANDS:
+            self.send_pseudo_response(answer_handshake(cmd_id, name, args))
             return
 
-        if "set_resign_threshold" in command:
-            try:
-                _, threshold = command.split()
-                threshold = float(threshold)
-                self.set_resign_threshold(threshold)
-            except Exception as e:
-                self.logger.error(f"Exception when dealing command {command}: {e}")
+        handler = self.handlers.get(name)
+        if handler:
+            handler(cmd_id, args)
             return
 
-        if "add_lag_buffer" in command:
+        setter = self.pipe_commands.get(name)
+        if setter:
             try:
-                _, seconds = command.split()
-                self.add_lag_buffer(seconds)
+                setter(*args)
+                self.send_pseudo_response(f"={cmd_id}")
             except Exception as e:
                 self.logger.error(f"Exception when dealing command {command}: {e}")
+                self.send_pseudo_response(f"?{cmd_id} {e}")
             return
 
-        if "append_engine" in command:
-            try:
-                _, engine_id = command.split()
-                self.append_engine(engine_id)
-                return
-            except Exception as e:
-                self.logger.error(f"Exception when dealing command {command}: {e}")
-
-        if "stop_engine" in command:
-            try:
-                _, engine_id = command.split()
-                self.stop_engine(engine_id)
-                return
-            except Exception as e:
-                self.logger.error(f"Exception when dealing command {command}: {e}")
-
-        if "time_left" in command:
-            try:
-                cmd_id = command.split()[0]
-                response = f"={cmd_id}"
-                self.send_pseudo_response(response)
-                return
-            except Exception as e:
-                self.logger.error(f"Exception when dealing command {command}, {e}")
-
-        if "time_settings" in command:
-            id, cmd, maint, byot, stone = command.strip().split()
-            self.max_time = float(byot) - self.lag_buffer
-            response = f"={id}"
-            self.send_pseudo_response(response)
-            return
-
-        if "komi" in command:
-            try:
-                komi = command.split()[-1]
-                komi = float(komi)
-                self.set_komi(komi)
-            except Exception as e:
-                self.logger.error(f"Exception when set komi to {komi}: {e}")
+        if name in BROADCAST_COMMANDS:
+            self.dealing_with_broadcast(command, cmd_id, name, args)
+        else:
+            self.dealing_with_query(cmd_id, name, args)
 
-        if "clear_board" in command:
+    def dealing_with_broadcast(self, command, cmd_id, name, args):
+        if name == "komi" and args:
+            self.set_komi(args[0])
+        elif name == "clear_board":
             self.init_game()
 
-        id, *_ = command.split()
-        response = f"={id}"
-        self.send_pseudo_response(response)
+        self.send_pseudo_response(f"={cmd_id}")
+        if self.pondering:
+            self.interrupt_ponder(command)
         self.send_command_to_engines(command)
-
-    def send_command_to_engines(self, command: str):
-        if "play" in command:
+        if self.pondering:
+            # any command stops kata-analyze, resume when the position is unchanged.
+            self.request_analysis(self.pondering, priority=PONDER_PRIORITY)
+
+    def dealing_with_query(self, cmd_id, name, args):
+        """Relay the response of the fastest engine, the engines agree on everything but moves."""
+        with self.hold_engines(time.time() + self.response_time_limit):
+            engine, response = self.pool.query(" ".join([name, *args]), self.response_time_limit)
+        if response is None:
+            self.send_pseudo_response(f"?{cmd_id} no engine answered {name}")
+        else:
+            success, text = response
+            self.send_pseudo_response(f"{'=' if success else '?'}{cmd_id} {text}")
+        if self.pondering and engine:
+            self.request_analysis(self.pondering, engines=[engine], priority=PONDER_PRIORITY)
+
+    def dealing_with_handicap(self, cmd_id, name, args):
+        """One engine places the stones, every engine and the game state get them as set_free_handicap."""
+        self.pondering = None
+        with self.hold_engines(time.time() + self.response_time_limit):
+            engine, response = self.pool.query(" ".join([name, *args]), self.response_time_limit)
+            if response is None or not response[0]:
+                reason = response[1] if response else f"no engine answered {name}"
+                self.send_pseudo_response(f"?{cmd_id} {reason}")
+                return
+            vertices = " ".join(response[1].split())
+            self.send_pseudo_response(f"={cmd_id} {vertices}")
+            # handicap needs an empty board, the placing engine is back on it before the broadcast.
+            engine("clear_board")
+            self.send_command_to_engines(f"set_free_handicap {vertices}")
+
+    def send_command_to_engines(self, command: str, skip=None):
+        # engines get the pipe's own ids, the controller's id stays with the controller.
+        _, name, args = split_command(command)
+        command = " ".join([name, *args])
+        if name == "play":
             self.move_counts += 1
 
-        if "analyze" not in command:
-            self.commands_send.append(command)
-
-        for engine in self.engines:
-            try:
-                engine(command)
-                self.logger.debug(f"Sending command {command} to {engine.engine_id}")
-            except Exception as e:
-                self.logger.error(
-                    f"Exception when sending command {command} to {engine.engine_id}: {e}"
-                )
+        with self.pool.lock:
+            if name in POSITION_COMMANDS:
+                self.generation = next(self.pool.generations)
+            self.game_state.update(command)
+            if self.scheduler:
+                self.scheduler.broadcast(self, command, skip, self.generation)
+            else:
+                self.pool.broadcast(command, skip, self.generation)
+        # lazy arguments, nothing is formatted when debug is off.
+        self.logger.debug("Sending command %s to %d engines", command.strip(), len(self.engines))
 
     def resignp(self):
         if len(self.winrates) < 20:
@@ -230,24 +312,21 @@ class GtpPipe:
             return True
         return False
 
+    def hold_engines(self, deadline: float):
+        """Context holding shared engines until the block ends, a session waits its turn by deadline."""
+        if self.scheduler is None:
+            return nullcontext(0)
+        return self.scheduler.use(self, deadline)
+
     def send_pseudo_response(self, line: str):
         line = line.strip()
         response = f"{line}\n\n"
-        print(response)
-        sys.stdout.flush()
+        self.output(response)
         self.logger.debug(f"Pipe send resoponse {response}")
 
-    def update_engine_list(self):
-        alive_engines = []
-        for engine in self.engines:
-            if engine.is_alive():
-                alive_engines.append(engine)
-        self.engines = alive_engines
-
     @property
     def alive_engines(self):
-        self.update_engine_list()
-        return self.engines
+        return [engine for engine in self.engines if engine.is_alive()]
 
     def set_top_visits(self, value: int):
         self.top_visits = int(value)
@@ -260,9 +339,8 @@ class GtpPipe:
 
     def add_lag_buffer(self, sec):
         additional_lag_buffer = float(sec)
-        self.max_time = self.max_time - additional_lag_buffer
-        self.lag_buffer += additional_lag_buffer
-        self.logger.debug(f"set lag buffer to {self.lag_buffer}")
+        self.time_manager.lag_buffer += additional_lag_buffer
+        self.logger.debug(f"set lag buffer to {self.time_manager.lag_buffer}")
 
     def set_komi(self, value: float):
         value = float(value)
@@ -271,65 +349,77 @@ class GtpPipe:
         if self.komi == 0.0:
             self.set_resign_threshold(0.05)
 
-    def dealing_with_genmove(self, command):
+    def start_ponder(self, color):
+        self.pondering = color
+        self.request_analysis(color, priority=PONDER_PRIORITY)
+        self.logger.debug(f"Pondering for {color}")
+
+    def interrupt_ponder(self, command):
+        _, name, args = split_command(command)
+        if name not in POSITION_COMMANDS:
+            return
+        if name == "play" and len(args) >= 2:
+            # katago keeps the searched subtree when the played move was in its tree.
+            ponder = MoveAggregator()
+            for engine in self.engines:
+                # the position is unchanged until this command is sent, older frames are of other positions.
+                if engine.analysis is not None and engine.analysis_generation == self.generation:
+                    ponder.update(engine.engine_id, engine.analysis)
+            predicted, *_ = ponder.best()
+            move = args[1].upper() if args[1].lower() != "pass" else "pass"
+            self.ponder_moves += 1
+            if move == predicted:
+                self.ponder_hits += 1
+            carried = int(ponder.visits[POINT_INDEX[move]]) if move in POINT_INDEX else 0
+            self.logger.debug(
+                f"Ponder predicted {predicted}, played {move}, {carried} visits carried, "
+                f"hits {self.ponder_hits}/{self.ponder_moves}"
+            )
+        self.pondering = None
+
+    def dealing_with_genmove(self, cmd_id, args):
+        self.pondering = None
         self.my_turn = True
         start = time.time()
-        deadline = start + self.max_time
-        response_deadline = start + self.response_time_limit
-
-        self.adjust_max_visits()
-
-        id, _, player = command.strip().split()
+        player = args[0]
 
+        self.plan_turn(player)
         self.analysis = {}
-        result = pd.DataFrame()
-
-        for engine in self.engines:
-            engine.analysis = None
-
-        self.request_analysis(player)
-
-        while True:
-            for engine in self.engines:
-                if engine.analysis is not None:
-                    self.analysis[engine.engine_id] = engine.analysis
-
-            if len(self.analysis) > 0:  # == len(self.engines):
-                try:
-                    result = pd.concat(self.analysis.values())
-
-                    total_visits = result.visits.sum()
-
-                    if total_visits >= self.max_visits:
-                        break
-
-                except Exception as e:
-                    self.logger.debug(f"Exception when reveiving analysis: {e}")
-
-            if len(result) == 0:
-                if time.time() > response_deadline:
-                    self.request_analysis(player)
-                    response_deadline += self.response_time_limit
-                    self.logger.warning(f"Response deadling reached.")
-
-            if time.time() >= deadline:
-                if len(result) > 0:
-                    break
-                else:
-                    deadline += self.max_time
-                    self.logger.warning(f"Deadline reached.")
-
-            time.sleep(0.1)
-
-        move = self.move_from_df(result)
+        self.aggregator.reset()
+        if self.live_feed:
+            self.live_feed.new_turn(self.move_counts, self.generation)
+
+        position = self.game_state.position_key(player) if self.cache else None
+        entry = self.cache.get(position) if position else None
+        cached = entry is not None and entry.visits >= self.max_visits
+        if cached:
+            self.logger.debug(f"Answer {position} from cache, {entry.visits} visits")
+            best, winrate, scoreLead = entry.move, entry.winrate, entry.scoreLead
+            total_visits = entry.visits
+        else:
+            with self.hold_engines(start + self.max_time) as queued:
+                total_visits = self.search(player, start, queued)
+            best, winrate, scoreLead = self.aggregator.best()
+            if best is not None:
+                self.merge_strategy.end_turn(self.aggregator, best)
+            # top up the entry when this search went deeper.
+            if best is not None and position and (entry is None or total_visits > entry.visits):
+                self.cache.put(position, CacheEntry(best, winrate, scoreLead, total_visits))
+
+        move = self.move_from_analysis(best, winrate, scoreLead)
         time_used = time.time() - start
 
         # send a response instead of engine
-        response = f"={id} {move}"
+        response = f"={cmd_id} {move}"
         self.send_pseudo_response(response)
+        if not cached:
+            profiler.record("response_gap", time.perf_counter() - self.search_ended)
+        profiler.record("genmove", time.time() - start)
 
         persudo_command = f"play {player} {move}\n"
         self.send_command_to_engines(persudo_command)
+        if self.ponder and move != "resign":
+            self.start_ponder(opponent(player))
 
         # turn tracking
         if self.opponent_turn_start:
@@ -342,6 +432,28 @@ class GtpPipe:
         self.logger.debug(f"Max turn time spend: {max(self.my_turn_times)}")
         self.my_turn = False
 
+        if self.telemetry:
+            self.telemetry.record(
+                {
+                    "time": round(start, 3),
+                    "move_number": self.move_counts,
+                    "player": player,
+                    "move": move,
+                    "visits": total_visits,
+                    "max_visits": self.max_visits,
+                    "time_used": round(time_used, 3),
+                    "max_time": round(self.max_time, 3),
+                    "winrate": winrate,
+                    "scoreLead": scoreLead,
+                    "engines": {
+                        engine_id: self.aggregator.engine_visits(engine_id)
+                        for engine_id in self.aggregator.engine_stats
+                    },
+                    "cached": cached,
+                    "session": self.session_id,
+                }
+            )
+
         # move info
         responsed_engines = self.analysis.keys()
         self.logger.info(f"Visits: {total_visits}")
@@ -350,42 +462,235 @@ class GtpPipe:
         self.logger.info(f"Winrates: {self.winrates[-3:]}")
         self.logger.info(f"ScoreLead: {self.scoreLead[-3:]}")
 
-    def move_from_df(self, result: pd.DataFrame):
-        result["totalScore"] = result.visits * result.scoreLead
-        result["totalWinrate"] = result.visits * result.winrate
-        result["totalOrder"] = result.visits * result.order
+    def dealing_with_genmove_cleanup(self, cmd_id, args):
+        # katago's cleanup search captures dead stones first, one engine is enough for it.
+        self.pondering = None
+        player = args[0]
+        self.plan_turn(player)
+        with self.hold_engines(time.time() + self.max_time):
+            engine, response = self.pool.query(
+                f"kgs-genmove_cleanup {player}", self.max_time + self.response_time_limit
+            )
+        if response is None or not response[0]:
+            self.send_pseudo_response(f"?{cmd_id} no engine answered kgs-genmove_cleanup")
+            return
+        move = response[1]
+        self.send_pseudo_response(f"={cmd_id} {move}")
+        if move.lower() == "resign":
+            return
+        # the answering engine played the move already.
+        self.send_command_to_engines(f"play {player} {move}", skip=engine)
 
-        # sum visits
-        result = (
-            result.loc[:, ["visits", "totalScore", "totalWinrate", "totalOrder"]]
-            .groupby(by=result.index)
-            .sum()
-        )
+    def dealing_with_traffic_stats(self, cmd_id, args):
+        """Analysis bytes per second of each engine since the last traffic_stats, and its round trip."""
+        now = time.time()
+        lines = []
+        for engine in self.engines:
+            traffic = engine.traffic()
+            received, since = self.traffic_marks.get(engine.engine_id, (0, engine.started_at))
+            self.traffic_marks[engine.engine_id] = (traffic["bytes"], now)
+            rate = (traffic["bytes"] - received) / max(now - since, 1e-9)
+            rtt = "-" if traffic["rtt"] is None else f"{traffic['rtt'] * 1000:.0f}ms"
+            lines.append(f"{engine.engine_id} {rate:.0f} B/s rtt {rtt}")
+        self.send_pseudo_response(f"={cmd_id} " + "\n".join(lines))
+
+    def dealing_with_gopipe_stats(self, cmd_id, args):
+        """Engine queues, traffic and ssh links, then the profile histograms.
+
+        gopipe_stats on/off switches profiling, gopipe_stats reset clears the histograms.
+        """
+        if args and args[0] in ("on", "off", "reset"):
+            if args[0] == "reset":
+                profiler.reset()
+            else:
+                profiler.enabled = args[0] == "on"
+            self.send_pseudo_response(f"={cmd_id}")
+            return
+        lines = [f"profile {'on' if profiler.enabled else 'off'} since {time.time() - profiler.since:.0f}s"]
+        for engine in self.engines:
+            queue = engine.command_queue
+            traffic = engine.traffic()
+            rtt = "-" if traffic["rtt"] is None else f"{traffic['rtt'] * 1000:.0f}ms"
+            lines.append(
+                f"engine {engine.engine_id} queue {queue.depth} max {queue.max_depth} merged {queue.merged} "
+                f"bytes {traffic['bytes']} rtt {rtt} visits/s {self.time_manager.rates.get(engine.engine_id, 0):.0f}"
+            )
+        # loaded by the first remote engine only.
+        ssh_pool = sys.modules.get("sshPool")
+        if ssh_pool:
+            for host, timings in ssh_pool.transport_pool.stats().items():
+                connect, channel = timings["connect_time"], timings["channel_time"]
+                lines.append(
+                    f"ssh {host} connects {timings['connects']} reuses {timings['reuses']} "
+                    f"connect {'-' if connect is None else f'{connect * 1000:.0f}ms'} "
+                    f"channel {'-' if channel is None else f'{channel * 1000:.0f}ms'}"
+                )
+        lines.extend(profiler.report())
+        self.send_pseudo_response(f"={cmd_id} " + "\n".join(lines))
 
-        result["avgScore"] = result.totalScore / result.visits
-        result["avgWinrate"] = result.totalWinrate / result.visits
-        result["avgOrder"] = result.totalOrder / result.visits
+    def search(self, player, start, queued=0) -> int:
+        """Analyse until the visit or time budget is reached, return the total visits.
+
+        queued is the number of commands just sent to sync the engines, they hold up no request.
+        """
+        deadline = start + self.max_time
+        self.time_manager.start_turn()
+        total_visits = 0
 
-        # calculate average
-        move = result.sort_values("avgOrder", ascending=True).index[0]
+        # frames of earlier positions are told apart by their generation, no reset needed.
+        requested = time.time()
+        # from the request, a session waiting for shared engines has not asked them before.
+        response_deadline = requested + self.response_time_limit
+        self.request_analysis(player, max_visits=self.max_visits, queued=queued)
+        hedged = set()
+        overdue = False
 
-        winrate = result.at[move, "avgWinrate"]
-        scoreLead = result.at[move, "avgScore"]
+        while True:
+            for engine in self.fresh_analysis_engines():
+                if engine.engine_id not in self.analysis:
+                    latency = time.time() - requested
+                    self.pool.health[engine.engine_id].seen(latency)
+                    profiler.record(f"first_analysis {engine.engine_id}", latency)
+                self.analysis[engine.engine_id] = engine.analysis
+                try:
+                    aggregate_start = time.perf_counter()
+                    self.aggregator.update(
+                        engine.engine_id,
+                        engine.analysis,
+                        self.merge_strategy.weight(engine.engine_id),
+                    )
+                    profiler.record("aggregate", time.perf_counter() - aggregate_start)
+                    self.time_manager.record(
+                        engine.engine_id, self.aggregator.engine_visits(engine.engine_id)
+                    )
+                    if self.live_feed:
+                        self.live_feed.publish(self.aggregator, engine.engine_id)
+                except Exception as e:
+                    self.logger.debug(f"Exception when reveiving analysis: {e}")
+
+            total_visits = self.aggregator.total_visits
+            if total_visits > 0 and total_visits >= self.max_visits:
+                break
+
+            if total_visits > 0 and self.scheduler and self.scheduler.preempted(self):
+                self.logger.debug(f"A more urgent session waits, answer at {total_visits} visits.")
+                break
+
+            if self.merge_strategy.converged(self.aggregator):
+                self.logger.debug(f"Engines converged at {total_visits} visits.")
+                break
+
+            best, second = self.aggregator.leading_visits()
+            if self.time_manager.unbeatable(best, second, total_visits, self.max_visits, deadline):
+                self.logger.debug(f"Best move can not be caught up, {best} vs {second} visits.")
+                break
+
+            if time.time() > response_deadline:
+                now = time.time()
+                silent = [e for e in self.engines if e.engine_id not in self.analysis]
+                # an engine searching this position for less than the limit is slow to report, not silent.
+                searching = [
+                    e.search_started + self.response_time_limit
+                    for e in silent
+                    if self.searching(e, requested) and e.search_started + self.response_time_limit > now
+                ]
+                if searching:
+                    response_deadline = max(searching)
+                else:
+                    # a miss counts once per turn.
+                    missed = [e.engine_id for e in silent if e.engine_id not in hedged]
+                    if missed:
+                        self.pool.hedge(missed)
+                        hedged.update(missed)
+                    if self.analysis:
+                        # stop waiting on the silent engines, go on with the ones answering.
+                        response_deadline = float("inf")
+                    else:
+                        # nothing at all yet, ask the silent engines again, never the answering ones.
+                        self.logger.warning(f"Response deadling reached.")
+                        self.request_analysis(player, engines=silent, max_visits=self.max_visits)
+                        response_deadline += self.response_time_limit
+
+            if time.time() >= deadline:
+                if total_visits > 0:
+                    break
+                if not overdue:
+                    # the clock is gone, the first analysis answers.
+                    overdue = True
+                    self.logger.warning(f"Deadline reached.")
+
+            if overdue:
+                wake_up = min(response_deadline, time.time() + self.response_time_limit)
+            else:
+                wake_up = min(deadline, response_deadline)
+            self.wait_for_analysis(wake_up - time.time())
+
+        # the response gap runs from here.
+        self.search_ended = time.perf_counter()
+        profiler.record("search", time.time() - start)
+        for engine_id in self.aggregator.engine_stats:
+            profiler.record(f"visits_per_second {engine_id}", self.time_manager.rates.get(engine_id), "rate")
+        return total_visits
+
+    def searching(self, engine, since: float) -> bool:
+        """Whether engine answered an analysis request of the current position sent after since."""
+        return (
+            engine.generation == self.generation
+            and engine.search_started is not None
+            and engine.search_started >= since
+        )
+
+    def fresh_analysis_engines(self) -> list:
+        # engines whose analysis of the current position has not been aggregated yet.
+        return [
+            engine
+            for engine in self.engines
+            if engine.analysis is not None
+            and engine.analysis_generation == self.generation
+            and engine.analysis is not self.analysis.get(engine.engine_id)
+        ]
+
+    def wait_for_analysis(self, timeout: float):
+        with self.analysis_ready:
+            # checked under the condition, so an update can not slip in before wait.
+            if not self.fresh_analysis_engines():
+                self.analysis_ready.wait(max(timeout, 0))
+
+    def move_from_analysis(self, move, winrate, scoreLead):
+        if move is None:
+            # no engine reported a move, a pass keeps the game going where an error would forfeit it.
+            self.logger.error("No analysis to choose a move from, pass.")
+            return "pass"
         self.winrates.append(round(winrate, 2))
         self.scoreLead.append(round(scoreLead, 2))
+        if self.live_feed:
+            self.live_feed.publish_history(self.winrates, self.scoreLead)
 
         if self.resignp():
             return "resign"
 
         return move
 
-    def adjust_max_visits(self):
-        # TODO: based on winrate and score
-        if self.move_counts < 10:
-            self.max_visits = self.top_visits / 10
-        else:
-            self.max_visits = self.top_visits
+    def plan_turn(self, player):
+        winrate = self.winrates[-1] if self.winrates else None
+        scoreLead = self.scoreLead[-1] if self.scoreLead else None
+        self.max_time, self.max_visits = self.time_manager.plan(
+            player, self.move_counts, self.top_visits, winrate, scoreLead
+        )
+        self.logger.debug(
+            f"Plan {self.max_visits} visits in {self.max_time:.1f}s, "
+            f"{self.time_manager.visits_per_second:.0f} visits/s"
+        )
 
-    def request_analysis(self, player, interval=50):
-        analyze_command = f"kata-analyze {player} {interval}".strip()
-        self.send_command_to_engines(analyze_command)
+    def request_analysis(self, player, interval=None, engines=None, max_visits=None, priority=0, queued=0):
+        # max_visits bounds engines able to stop on their own, gtp engines are stopped by the pipe.
+        interval = interval or self.analyze_interval
+        with self.pool.lock:
+            for engine in self.engines if engines is None else engines:
+                if self.pool.degraded(engine, queued):
+                    self.logger.debug(
+                        f"{engine.engine_id} is degraded, {engine.command_queue.depth} commands queued"
+                    )
+                    continue
+                profiler.record(f"queue_depth {engine.engine_id}", engine.command_queue.depth, "count")
+                engine.analyze(player, interval, max_visits, priority, self.generation)
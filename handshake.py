@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+import threading
+
+from constants import NAME, VERSION
+from gameState import split_command
+
+_stdout_lock = threading.Lock()
+
+# commands the pipe answers, broadcasts or relays, for list_commands and known_command.
+KNOWN_COMMANDS = [
+    "protocol_version",
+    "name",
+    "version",
+    "known_command",
+    "list_commands",
+    "quit",
+    "boardsize",
+    "clear_board",
+    "komi",
+    "play",
+    "undo",
+    "genmove",
+    "kgs-genmove_cleanup",
+    "time_settings",
+    "time_left",
+    "kata-set-rules",
+    "kata-analyze",
+    "lz-analyze",
+    "showboard",
+    "final_score",
+    "final_status_list",
+    "set_top_visits",
+    "set_resign_threshold",
+    "add_lag_buffer",
+    "append_engine",
+    "stop_engine",
+    "traffic_stats",
+    "gopipe_stats",
+]
+
+
+HANDSHAKE_COMMANDS = ("protocol_version", "name", "version", "list_commands", "known_command")
+
+
+def write_stdout(text: str):
+    """The one writer of gtp responses to stdout, the main and the message loop thread share it."""
+    with _stdout_lock:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+def handshake_response(command: str):
+    """The response to a controller handshake command, None for any other command.
+
+    These never need an engine, so they are answered before the engines are up.
+    """
+    cmd_id, name, args = split_command(command)
+    if name not in HANDSHAKE_COMMANDS:
+        return None
+    return answer_handshake(cmd_id or "", name, args)
+
+
+def answer_handshake(cmd_id: str, name: str, args: list) -> str:
+    if name == "protocol_version":
+        return f"={cmd_id} 2"
+    if name == "name":
+        return f"={cmd_id} {NAME}"
+    if name == "version":
+        return f"={cmd_id} {VERSION}"
+    if name == "list_commands":
+        return f"={cmd_id} " + "\n".join(KNOWN_COMMANDS)
+    known = bool(args) and args[0] in KNOWN_COMMANDS
+    return f"={cmd_id} {str(known).lower()}"
@@ -1,16 +1,16 @@
 import os
-from queue import Queue
 import shlex
 import subprocess
 import sys
 import threading
 
-import pandas as pd
-
-from logger import logger
+from commandQueue import CommandQueue
+from logger import get_logger
 from config import config
 from localEngine import LocalEngine
 
+logger = get_logger("engine")
+
 engine_config = config['IKATAGO']
 USER_FOLDER = engine_config.get('data_folder')
 
@@ -23,14 +23,14 @@ class IkatagoEngine(LocalEngine):
         self.username = engine_config.get('username', 'someone')
         self.password = engine_config.get('password', 'hard-to-guess')
 
-        self.command_queue = Queue()
+        self.command_queue = CommandQueue()
         self.katago_process = None
         self.read_katago_thread = None
         self.command_loop_thread = None
         self.shell = False
         self.logger = logger
 
-        self.analysis = None
+        self.init_state()
 
         self.set_command()
 
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import atexit
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from aggregator import POINTS, SCORE, VISITS, WINRATE, best_move
+from logger import get_logger
+
+logger = get_logger("pipe")
+
+MAGIC = b"GOPIPE"
+VERSION = 2
+MAX_ENGINES = 16
+MAX_HISTORY = 1024
+
+# fixed little-endian layout of the shared block, readers map the same dtype over it.
+# stats rows are those of aggregator.MoveAggregator: weighted visits, then visit-weighted winrate, scoreLead and order.
+# visits holds the plain visit counts of the merged moves, the weighted ones only rank them.
+LAYOUT = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        # process writing the feed, a block whose writer is gone may be taken over.
+        ("pid", "<u4"),
+        ("engine_count", "<u4"),
+        # odd while the writer is inside an update, readers retry then.
+        ("seq", "<u8"),
+        ("time", "<f8"),
+        ("generation", "<u8"),
+        ("move_number", "<u4"),
+        ("history_length", "<u4"),
+        ("total", "<f8", (4, len(POINTS))),
+        ("visits", "<f8", (len(POINTS),)),
+        ("engine_ids", "S8", (MAX_ENGINES,)),
+        ("engine_weights", "<f8", (MAX_ENGINES,)),
+        ("engine_stats", "<f8", (MAX_ENGINES, 4, len(POINTS))),
+        ("winrates", "<f8", (MAX_HISTORY,)),
+        ("scoreLead", "<f8", (MAX_HISTORY,)),
+    ],
+    align=True,
+)
+
+
+class LiveFeed:
+    """The merged analysis of the current turn in shared memory, for viewers in other processes.
+
+    Updates are seqlocked instead of locked, the search never waits on a reader.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.logger = logger
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=LAYOUT.itemsize)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name)
+            if in_use(existing):
+                # another pipe on this machine writes it, this one gets a name of its own.
+                existing.close()
+                self.logger.warning(f"Live feed {name} is in use, writing {name}-{os.getpid()} instead")
+                name = f"{name}-{os.getpid()}"
+            else:
+                # left behind by a pipe that did not exit cleanly.
+                existing.close()
+                existing.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=LAYOUT.itemsize)
+        self.name = name
+        self.feed = np.ndarray((), dtype=LAYOUT, buffer=self.shm.buf)
+        self.feed[()] = np.zeros((), dtype=LAYOUT)
+        self.feed["magic"] = MAGIC
+        self.feed["version"] = VERSION
+        self.feed["pid"] = os.getpid()
+        # engine id -> row of engine_stats in this turn.
+        self.slots: dict = {}
+        # the atexit close may run while a session thread still writes.
+        self.lock = threading.Lock()
+        self.closed = False
+        # the pipe exits on quit without closing its sessions.
+        atexit.register(self.close)
+        self.logger.info(f"Live analysis feed in shared memory {name}")
+
+    def _begin(self):
+        self.feed["seq"] += 1
+
+    def _end(self):
+        self.feed["time"] = time.time()
+        self.feed["seq"] += 1
+
+    def new_turn(self, move_number: int, generation: int):
+        with self.lock:
+            if self.closed:
+                return
+            self._begin()
+            self.slots = {}
+            self.feed["engine_count"] = 0
+            self.feed["move_number"] = move_number
+            self.feed["generation"] = generation
+            self.feed["total"] = 0
+            self.feed["visits"] = 0
+            self.feed["engine_ids"] = b""
+            self._end()
+
+    def publish(self, aggregator, engine_id: str):
+        """Copy the merged stats and the contribution of engine_id, the only one that changed."""
+        with self.lock:
+            if self.closed:
+                return
+            slot = self.slots.get(engine_id)
+            if slot is None:
+                if len(self.slots) >= MAX_ENGINES:
+                    return
+                slot = self.slots[engine_id] = len(self.slots)
+            self._begin()
+            self.feed["total"] = aggregator.total
+            self.feed["visits"] = aggregator.visits
+            self.feed["engine_stats"][slot] = aggregator.engine_stats[engine_id]
+            self.feed["engine_weights"][slot] = aggregator.engine_weights[engine_id]
+            self.feed["engine_ids"][slot] = engine_id.encode()[:8]
+            self.feed["engine_count"] = len(self.slots)
+            self._end()
+
+    def publish_history(self, winrates: list, scoreLead: list):
+        # the latest MAX_HISTORY moves of the game.
+        winrates, scoreLead = winrates[-MAX_HISTORY:], scoreLead[-MAX_HISTORY:]
+        with self.lock:
+            if self.closed:
+                return
+            self._begin()
+            self.feed["winrates"][: len(winrates)] = winrates
+            self.feed["scoreLead"][: len(scoreLead)] = scoreLead
+            self.feed["history_length"] = len(winrates)
+            self._end()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            # the view exports the mapping, it has to go before the segment can be closed.
+            del self.feed
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                # taken over by a pipe that found this one gone.
+                pass
+
+
+class LiveFeedReader:
+    """Polls the feed of a running pipe, e.g. LiveFeedReader("gopipe").read()."""
+
+    def __init__(self, name: str = "gopipe") -> None:
+        self.shm = attach(name)
+        self.feed = np.ndarray((), dtype=LAYOUT, buffer=self.shm.buf)
+        if self.feed["magic"].item() != MAGIC or int(self.feed["version"]) != VERSION:
+            raise ValueError(f"{name} is not a live feed of version {VERSION}")
+
+    def snapshot(self, retries: int = 100):
+        """A consistent copy of the whole block, None when the writer kept changing it."""
+        for _ in range(retries):
+            seq = int(self.feed["seq"])
+            if seq % 2 == 0:
+                copy = self.feed.copy()
+                if int(self.feed["seq"]) == seq:
+                    return copy
+            time.sleep(0)
+        return None
+
+    def read(self, top: int = 10):
+        """The feed as a dict of plain values, with the top moves by visits."""
+        feed = self.snapshot()
+        if feed is None:
+            return None
+        total, visits = feed["total"], feed["visits"]
+        moves = []
+        for i in np.argsort(-total[VISITS])[:top]:
+            weighted = total[VISITS, i]
+            if weighted <= 0:
+                break
+            moves.append(
+                {
+                    "move": POINTS[i],
+                    "visits": int(visits[i]),
+                    "winrate": float(total[WINRATE, i] / weighted),
+                    "scoreLead": float(total[SCORE, i] / weighted),
+                }
+            )
+        engines = {}
+        for slot in range(int(feed["engine_count"])):
+            stats = feed["engine_stats"][slot]
+            move, winrate, scoreLead = best_move(stats)
+            engines[feed["engine_ids"][slot].decode()] = {
+                "visits": int(stats[VISITS].sum()),
+                "weight": float(feed["engine_weights"][slot]),
+                "move": move,
+                "winrate": winrate,
+                "scoreLead": scoreLead,
+            }
+        length = int(feed["history_length"])
+        return {
+            "time": float(feed["time"]),
+            "generation": int(feed["generation"]),
+            "move_number": int(feed["move_number"]),
+            "visits": int(visits.sum()),
+            "moves": moves,
+            "engines": engines,
+            "winrates": feed["winrates"][:length].tolist(),
+            "scoreLead": feed["scoreLead"][:length].tolist(),
+        }
+
+    def close(self):
+        del self.feed
+        self.shm.close()
+
+
+def in_use(shm) -> bool:
+    """Whether the feed in shm belongs to a running process, blocks of another layout count as in use."""
+    if sys.platform == "win32":
+        # windows frees a block with its last handle, one that still exists is held open.
+        return True
+    if shm.size < LAYOUT.itemsize:
+        return True
+    feed = np.ndarray((), dtype=LAYOUT, buffer=shm.buf)
+    ours = feed["magic"].item() == MAGIC and int(feed["version"]) == VERSION
+    pid = int(feed["pid"])
+    del feed
+    if not ours:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def attach(name: str):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # before python 3.13 an attached block is tracked, and unlinked when the reader exits.
+        shm = shared_memory.SharedMemory(name)
+        if sys.platform != "win32":
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+if __name__ == "__main__":
+    # python liveFeed.py [name], prints the best moves twice a second.
+    reader = LiveFeedReader(*sys.argv[1:2])
+    try:
+        while True:
+            feed = reader.read(3)
+            if feed:
+                moves = " ".join(f"{m['move']} {m['visits']} {m['winrate']:.3f}" for m in feed["moves"])
+                print(f"move {feed['move_number']} visits {feed['visits']}: {moves}", flush=True)
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        reader.close()
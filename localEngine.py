@@ -4,14 +4,14 @@ import subprocess
 import sys
 import threading
 import traceback
-from queue import Queue
 
-import pandas as pd
-
-from logger import logger
+from commandQueue import CommandQueue
+from logger import get_logger
 from config import config
 from engine import GtpEngine
 
+logger = get_logger("engine")
+
 engine_config = config["LOCAL"]
 USER_FOLDER = engine_config.get("katago_folder")
 
@@ -23,14 +23,14 @@ class LocalEngine(GtpEngine):
         self.engine_id = str(0)
         self.katago_process = None
 
-        self.command_queue = Queue()
+        self.command_queue = CommandQueue()
         self.read_katago_thread = None
         self.command_loop_thread = None
         self._lock = threading.Lock()
         self.shell = False
 
         self.logger = logger
-        self.analysis = None
+        self.init_state()
 
         self.set_command()
 
@@ -80,6 +80,7 @@ class LocalEngine(GtpEngine):
         command = "quit"
         self.send_command(command)
         self.katago_process = None
+        self.command_queue.close()
         self.logger.debug(f"stop engine {self.engine_id}.")
 
     def is_alive(self, os_error="", exception_if_dead=False) -> bool:
@@ -108,24 +109,12 @@ class LocalEngine(GtpEngine):
     def _read_katago_thread(self):
         while self.is_alive():
             try:
-                line: str = self.katago_process.stdout.readline().strip().decode()
+                line: str = self.katago_process.stdout.readline().rstrip().decode()
             except OSError as e:
                 self.logger.error(f"Can not read line: {e}")
                 return
 
-            if "Uncaught exception" in line:
-                self.logger.error(f"Engine Failed: {line}")
-
-            if not line:
-                continue
-
-            try:
-                if "info move" in line:
-                    self.analysis = self.analysis_to_df(line)
-            except Exception as e:
-                self.logger.error(
-                    f"Unexpected exception {e} while processing Engine output {line[:20]}"
-                )
+            self.process_line(line)
 
     def send_command(self, command):
         try:
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
+import atexit
 import logging
+import logging.handlers
 import os
 from datetime import datetime
+from queue import SimpleQueue
 
 from config import config
 
@@ -12,9 +15,29 @@ LOG_FOLDER = log_config.get('log_folder')
 log_filename = ''.join(str(datetime.now()).split(':'))
 LOG_FILE = os.path.expanduser(os.path.join(
     LOG_FOLDER, f'{log_filename}.log'))
-logging.basicConfig(level=logging.DEBUG,
-                    filename=LOG_FILE,
-                    datefmt='%Y/%m/%d %H:%M:%S',
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(module)s - %(message)s')
+# subsystems with their own level in [LOG], e.g. engine_level = INFO
+SUBSYSTEMS = ('pipe', 'engine', 'pool', 'cache', 'telemetry')
 
-logger = logging.getLogger(__name__)
+# records are only queued on the calling thread, the listener thread formats and writes them.
+file_handler = logging.FileHandler(LOG_FILE)
+file_handler.setFormatter(logging.Formatter(
+    datefmt='%Y/%m/%d %H:%M:%S',
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(module)s - %(message)s'))
+log_queue = SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, file_handler)
+listener.start()
+atexit.register(listener.stop)
+
+logger = logging.getLogger('gopipe')
+logger.setLevel(log_config.get('level', 'DEBUG').upper())
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.propagate = False
+
+for subsystem in SUBSYSTEMS:
+    level = log_config.get(f'{subsystem}_level')
+    if level:
+        logger.getChild(subsystem).setLevel(level.upper())
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    return logger.getChild(subsystem)
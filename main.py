@@ -1,6 +1,40 @@
 #!/usr/bin/env python3
 
-from gtpPipe import GtpPipe
+import threading
+from queue import Queue
+
+from config import config
+from gameState import split_command
+from handshake import handshake_response, write_stdout
+from logger import get_logger
+
+logger = get_logger("pipe")
+
+
+def create_pipe(engines):
+    from gtpPipe import GtpPipe
+
+    return GtpPipe(engines, local=False, output=write_stdout)
+
+
+def finish(pipe):
+    """Wait until the pipe has answered every command it got."""
+    pipe.close()
+    pipe.message_loop_thread.join()
+
+
+def forward_when_ready(engines, pending: Queue):
+    """Build the pipe, then hand it every command read meanwhile and after, until None."""
+    pipe = create_pipe(engines)
+    while True:
+        command = pending.get()
+        if command is None:
+            finish(pipe)
+            return
+        try:
+            pipe(command)
+        except Exception as e:
+            logger.error(f"Error in sending command {command} to pipe.\n{e}")
 
 
 def main():
@@ -10,19 +44,55 @@ def main():
     # to enable local engine:
     # change local to True, or type 'append_engine 0' in gtp shell during play
     engines = [1, 2]
-    pipe = GtpPipe(engines, local=False)
+    listen = [address.strip() for address in config["PIPE"].get("listen", "").split(",") if address.strip()]
+    if listen:
+        # server mode, every client plays its own game on the shared engines.
+        from server import GtpServer
+
+        GtpServer(engines, local=False).run(listen)
+        return
 
+    fast_start = config["PIPE"].getboolean("fast_start", True)
+    if fast_start:
+        # controllers time out on a silent engine, so the handshake is answered
+        # here while gtpPipe and its engines load in the background.
+        pending = Queue()
+        forwarder = threading.Thread(target=forward_when_ready, args=(engines, pending), daemon=True)
+        forwarder.start()
+        pipe = pending.put
+    else:
+        pipe = gtp_pipe = create_pipe(engines)
+
+    # commands went to the pipe, a handshake answered here would overtake their responses.
+    forwarded = False
     while True:
-        ipt_line = input()
+        try:
+            command = input()
+        except EOFError:
+            break
 
         try:
-            command = ipt_line
-            if "quit" in command:
-                print(f"= \n\n")
+            command = command.split("#", 1)[0].strip()
+            cmd_id, name, _ = split_command(command)
+            if not name:
+                continue
+            if name == "quit":
+                # the responses of the commands before quit come first.
+                if fast_start:
+                    pending.put(None)
+                    forwarder.join()
+                else:
+                    finish(gtp_pipe)
+                write_stdout(f"={cmd_id or ''}\n\n")
                 break
+            response = handshake_response(command) if fast_start and not forwarded else None
+            if response is not None:
+                write_stdout(f"{response}\n\n")
+                continue
             pipe(command)
+            forwarded = True
         except Exception as e:
-            pipe.logger.error(f"Error in sending command {command} to pipe.\n{e}")
+            logger.error(f"Error in sending command {command} to pipe.\n{e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+from config import config
+from logger import get_logger
+
+logger = get_logger("pipe")
+
+pipe_config = config["PIPE"]
+# engine_id = weight, engines not listed weigh 1.
+weight_config = config["WEIGHTS"] if config.has_section("WEIGHTS") else {}
+
+# how fast trust follows agreement with the chosen move.
+TRUST_RATE = 0.1
+# an engine that never agrees still keeps this much of its weight.
+MIN_TRUST = 0.2
+
+
+class MergeStrategy:
+    """Every visit counts the same, the original merge."""
+
+    def __init__(self) -> None:
+        self.logger = logger
+        # stop once every engine agrees on the best move with this many visits, 0 is off.
+        self.converge_visits = pipe_config.getint("converge_visits", 0)
+
+    def weight(self, engine_id: str) -> float:
+        return 1.0
+
+    def converged(self, aggregator) -> bool:
+        if not self.converge_visits or len(aggregator.engine_stats) < 2:
+            return False
+        moves = set()
+        for engine_id in aggregator.engine_stats:
+            if aggregator.engine_visits(engine_id) < self.converge_visits:
+                return False
+            moves.add(aggregator.engine_best(engine_id)[0])
+        return len(moves) == 1
+
+    def end_turn(self, aggregator, move: str):
+        pass
+
+
+class WeightedMerge(MergeStrategy):
+    """Visits count as much as the engine's weight in the [WEIGHTS] section."""
+
+    def weight(self, engine_id: str) -> float:
+        return float(weight_config.get(engine_id, 1))
+
+
+class TrustMerge(WeightedMerge):
+    """Weights scaled by how often the engine's own best move was the chosen one."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.trust: dict = {}
+
+    def weight(self, engine_id: str) -> float:
+        trust = self.trust.get(engine_id, 1.0)
+        return super().weight(engine_id) * (MIN_TRUST + (1 - MIN_TRUST) * trust)
+
+    def end_turn(self, aggregator, move: str):
+        for engine_id in aggregator.engine_stats:
+            agree = aggregator.engine_best(engine_id)[0] == move
+            trust = self.trust.get(engine_id, 1.0)
+            self.trust[engine_id] = trust + TRUST_RATE * (agree - trust)
+        self.logger.debug(f"Engine trust: {self.trust}")
+
+
+MERGE_STRATEGIES = {
+    "equal": MergeStrategy,
+    "weighted": WeightedMerge,
+    "trust": TrustMerge,
+}
+
+
+def create_merge_strategy(name: str) -> MergeStrategy:
+    if name not in MERGE_STRATEGIES:
+        logger.error(f"Unknown merge strategy {name}, using equal.")
+        name = "equal"
+    return MERGE_STRATEGIES[name]()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import threading
+import time
+
+from logger import get_logger
+
+logger = get_logger("cache")
+
+
+class CacheEntry:
+    __slots__ = ("move", "winrate", "scoreLead", "visits")
+
+    def __init__(self, move: str, winrate: float, scoreLead: float, visits: int) -> None:
+        self.move = move
+        self.winrate = winrate
+        self.scoreLead = scoreLead
+        self.visits = visits
+
+
+class PositionCache:
+    """Merged genmove results keyed by position, kept in SQLite with LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 100000) -> None:
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.logger = logger
+        self._lock = threading.Lock()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS positions ("
+            "key TEXT PRIMARY KEY, move TEXT, winrate REAL, scoreLead REAL, "
+            "visits INTEGER, last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS lru ON positions (last_used)")
+        self.db.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT move, winrate, scoreLead, visits FROM positions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE positions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return CacheEntry(*row)
+
+    def put(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.move, entry.winrate, entry.scoreLead, entry.visits, time.time()),
+            )
+            (count,) = self.db.execute("SELECT COUNT(*) FROM positions").fetchone()
+            if count > self.max_entries:
+                # evict a tenth at once, so eviction is not paid on every put.
+                self.db.execute(
+                    "DELETE FROM positions WHERE key IN "
+                    "(SELECT key FROM positions ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries + self.max_entries // 10,),
+                )
+            self.db.commit()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import bisect
+import threading
+import time
+
+from config import config
+
+pipe_config = config["PIPE"]
+
+# bucket upper bounds, 1-2-5 steps: seconds from 10us to 100s, rates and counts.
+TIME_BOUNDS = [m * 10 ** e for e in range(-5, 2) for m in (1, 2, 5)] + [100]
+RATE_BOUNDS = [m * 10 ** e for e in range(0, 6) for m in (1, 2, 5)]
+COUNT_BOUNDS = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256]
+# kind -> (bounds, scale and unit of the report).
+KINDS = {
+    "time": (TIME_BOUNDS, 1000, "ms"),
+    "rate": (RATE_BOUNDS, 1, "/s"),
+    "count": (COUNT_BOUNDS, 1, ""),
+}
+
+
+class Histogram:
+    """Counts per bucket, percentiles are reported as the bound of their bucket."""
+
+    def __init__(self, bounds: list, scale: float = 1, unit: str = "") -> None:
+        self.bounds = bounds
+        self.scale = scale
+        self.unit = unit
+        # the last bucket holds values above every bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, share: float) -> float:
+        rank = share * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> str:
+        value = lambda v: f"{v * self.scale:.4g}{self.unit}"
+        return (
+            f"n {self.count} mean {value(self.total / self.count)} p50 {value(self.percentile(0.5))} "
+            f"p90 {value(self.percentile(0.9))} p99 {value(self.percentile(0.99))} max {value(self.max)}"
+        )
+
+
+class Profiler:
+    """Named histograms of where the turns go, recorded only while enabled.
+
+    record is called from the engine reader threads too, a disabled profiler returns at once.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms: dict = {}
+        self.since = time.time()
+
+    def record(self, name: str, value: float, kind: str = "time"):
+        if not self.enabled or value is None:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(*KINDS[kind])
+            histogram.add(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.since = time.time()
+
+    def report(self) -> list:
+        with self.lock:
+            return [f"{name} {self.histograms[name].summary()}" for name in sorted(self.histograms)]
+
+
+profiler = Profiler(pipe_config.getboolean("profile", False))
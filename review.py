@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from queue import Empty, Queue
+
+from config import config
+from enginePool import EnginePool
+from logger import get_logger
+from sgf import load_sgf
+
+logger = get_logger("pipe")
+
+review_config = config["REVIEW"]
+pipe_config = config["PIPE"]
+
+# tries of a position whose engine died or ran out of time, a position an engine rejects is skipped at once.
+MAX_ATTEMPTS = 3
+# failed starts of an engine before its worker gives up on it.
+MAX_START_FAILURES = 3
+
+
+def configured_engines() -> list:
+    """Ids of the remote engines in [ENGINE]."""
+    defaults = config.defaults()
+    return [engine_id for engine_id in config["ENGINE"] if engine_id not in defaults]
+
+
+class Review:
+    """Analyses every position of a batch of games on all engines at once.
+
+    Each engine reviews positions from one shared queue and keeps its position
+    between them, so a position later in the same game costs only its moves.
+    One JSON line per position goes to output, a rerun skips the positions in it.
+    """
+
+    def __init__(self, engine_ids: list, output: str, visits: int, timeout: float) -> None:
+        self.logger = logger
+        self.output = output
+        self.visits = visits
+        self.timeout = timeout
+        self.interval = pipe_config.getint("analyze_interval", 50)
+        # (game, file path, move index, attempts) still to review.
+        self.positions = Queue()
+        self.total = 0
+        self.reviewed = 0
+        # positions neither written nor given up, requeued ones included.
+        self.remaining = 0
+        self.write_lock = threading.Lock()
+        # every engine reviews its own position, a restarted one starts from nothing.
+        self.pool = EnginePool(lambda: [])
+        self.engine_ids = [str(engine_id) for engine_id in engine_ids]
+        for engine_id in self.engine_ids:
+            self.pool.append_engine(engine_id)
+
+    def done_positions(self) -> set:
+        """(file path, move) of the positions already in output."""
+        done = set()
+        if not os.path.exists(self.output):
+            return done
+        with open(self.output, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    done.add((result["file"], result["move"]))
+                except (ValueError, KeyError):
+                    # the line an interrupted run was writing.
+                    continue
+        return done
+
+    def load(self, paths: list):
+        done = self.done_positions()
+        for path in paths:
+            try:
+                game = load_sgf(path)
+            except (OSError, ValueError, IndexError) as e:
+                self.logger.error(f"Can not read {path}: {e}")
+                continue
+            # games of different folders may share a file name.
+            name = os.path.relpath(path)
+            for move_number in range(len(game.moves)):
+                if (name, move_number + 1) not in done:
+                    self.positions.put((game, name, move_number, 1))
+                    self.total += 1
+        self.remaining = self.total
+        if done:
+            print(f"{len(done)} positions reviewed before, {self.total} to go", flush=True)
+
+    def run(self) -> int:
+        """Review the loaded positions, return how many are left when every engine was given up."""
+        threads = [
+            threading.Thread(target=self._worker_thread, args=(engine_id,), daemon=True)
+            for engine_id in self.engine_ids
+        ]
+        start = time.time()
+        with open(self.output, "a", encoding="utf-8", buffering=1) as self.out:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for engine in list(self.pool.engines):
+            engine.stop()
+        print(f"{self.reviewed} positions in {time.time() - start:.0f}s", flush=True)
+        return self.remaining
+
+    def _worker_thread(self, engine_id: str):
+        # engine this worker holds the position of, and (game, moves played) on it.
+        engine = held = None
+        generations = itertools.count(1)
+        while self.remaining:
+            current = self.pool.get(engine_id)
+            if current is None:
+                failures = self.pool.health[engine_id].failures
+                if failures >= MAX_START_FAILURES:
+                    self.logger.error(f"{engine_id} failed to start {failures} times, given up")
+                    print(f"engine {engine_id} failed to start {failures} times, given up", flush=True)
+                    self.pool.stop_engine(engine_id)
+                    return
+                # not started yet or restarting, the other engines carry on.
+                time.sleep(1)
+                continue
+            if current is not engine:
+                engine, held = current, None
+            try:
+                game, name, move_number, attempts = self.positions.get(timeout=1)
+            except Empty:
+                continue
+
+            generation = next(generations)
+            if held and held[0] is game and held[1] <= move_number:
+                commands = [f"play {color} {move}" for color, move in game.moves[held[1] : move_number]]
+            else:
+                commands = game.position_commands(move_number)
+            for command in commands:
+                engine.send(command, generation)
+            engine.analyze(game.moves[move_number][0], self.interval, self.visits, 0, generation)
+            held = (game, move_number)
+
+            analysis = self.wait_for_visits(engine, generation)
+            if analysis:
+                self.write(engine_id, game, name, move_number, analysis)
+            elif engine.failed_generation == generation:
+                # e.g. an illegal move, every engine would reject it too.
+                self.logger.error(f"{engine_id} rejected the position of {name} move {move_number + 1}, skipped")
+                held = None
+                with self.write_lock:
+                    self.remaining -= 1
+            elif attempts < MAX_ATTEMPTS:
+                self.logger.warning(f"{engine_id} did not review {name} move {move_number + 1}, requeued")
+                self.positions.put((game, name, move_number, attempts + 1))
+                held = None
+            else:
+                self.logger.error(f"{name} move {move_number + 1} failed {attempts} times, skipped")
+                with self.write_lock:
+                    self.remaining -= 1
+
+    def wait_for_visits(self, engine, generation: int):
+        """The analysis of generation once it has the visit budget, None when the engine fails or rejects it."""
+        deadline = time.time() + self.timeout
+        analysis = None
+        while time.time() < deadline:
+            if engine.failed_generation == generation:
+                return None
+            with self.pool.analysis_ready:
+                if engine.analysis_generation == generation:
+                    analysis = engine.analysis
+                    if sum(info.visits for info in analysis.values()) >= self.visits:
+                        return analysis
+                self.pool.analysis_ready.wait(0.5)
+            if not engine.is_alive():
+                return None
+        # out of time, take what the engine has found.
+        return analysis
+
+    def write(self, engine_id: str, game, name: str, move_number: int, analysis: dict):
+        player, played = game.moves[move_number]
+        best = min(analysis.values(), key=lambda info: info.order)
+        played_info = analysis.get(played)
+        # winrate and scoreLead are the side to move's.
+        result = {
+            "file": name,
+            "move": move_number + 1,
+            "player": player,
+            "played": played,
+            "best": best.move,
+            "winrate": round(best.winrate, 4),
+            "scoreLead": round(best.scoreLead, 2),
+            "played_winrate": round(played_info.winrate, 4) if played_info else None,
+            "visits": sum(info.visits for info in analysis.values()),
+            "engine": engine_id,
+        }
+        with self.write_lock:
+            self.out.write(json.dumps(result, separators=(",", ":")) + "\n")
+            self.reviewed += 1
+            self.remaining -= 1
+            if self.reviewed % 50 == 0 or self.reviewed == self.total:
+                print(f"{self.reviewed}/{self.total} positions", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review sgf files on all engines")
+    parser.add_argument("sgf", nargs="+", help="sgf files or glob patterns")
+    parser.add_argument("-o", "--output", default=review_config.get("output", "review.jsonl"))
+    parser.add_argument("--visits", type=int, default=review_config.getint("visits", 1600))
+    parser.add_argument(
+        "--engines",
+        default=review_config.get("engines", "") or ",".join(configured_engines()),
+        help="comma separated engine ids, 0 is local and i ikatago",
+    )
+    parser.add_argument("--timeout", type=float, default=review_config.getfloat("position_timeout", 60))
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.sgf for path in glob.glob(pattern) or [pattern])
+    engine_ids = [engine_id.strip() for engine_id in args.engines.split(",") if engine_id.strip()]
+    review = Review(engine_ids, args.output, args.visits, args.timeout)
+    review.load(paths)
+    left = review.run()
+    if left:
+        sys.exit(f"no engine left, {left} positions not reviewed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from logger import get_logger
+
+logger = get_logger("pool")
+
+
+class PoolScheduler:
+    """Lends one EnginePool to one session at a time, the session with the earliest deadline first.
+
+    A holder whose search is overtaken by an earlier deadline is preempted, see preempted.
+    The engines hold a single position. A session gets them synced to its own
+    game state, which is skipped when they still hold its position.
+    """
+
+    def __init__(self, pool) -> None:
+        self.pool = pool
+        self.logger = logger
+        self.turn = threading.Condition()
+        # heap of (deadline, arrival, session) waiting for the engines.
+        self.waiting = []
+        self.arrivals = itertools.count()
+        self.holder = None
+        self.holder_deadline = None
+        # session whose position the engines hold, None while nobody's is known.
+        self.synced = None
+
+    def sync_commands(self) -> list:
+        session = self.synced
+        return session.game_state.sync_commands() if session else []
+
+    def holds(self, session) -> bool:
+        return self.holder is session
+
+    def preempted(self, session) -> bool:
+        """Whether session holds the engines while a more urgent session waits for them."""
+        with self.turn:
+            return self.holder is session and bool(self.waiting) and self.urgent(self.waiting[0][0])
+
+    def urgent(self, deadline: float) -> bool:
+        # a waiter needs the engines for its first analysis before its deadline, the holder gives way for that.
+        return deadline - self.pool.first_analysis_latency() < self.holder_deadline
+
+    def broadcast(self, session, command: str, skip=None, generation=None):
+        """Send a command of session to the engines while they hold its position.
+
+        Otherwise only its game state changed, it is synced when it gets the engines.
+        """
+        with self.turn:
+            # synced is cleared when another session is granted, so the engines are free or ours.
+            if self.synced is session:
+                self.pool.broadcast(command, skip, generation)
+
+    @contextmanager
+    def use(self, session, deadline: float):
+        """Hold the engines for session until the block ends, yields the commands queued to sync them."""
+        commands = []
+        with self.turn:
+            entry = (deadline, next(self.arrivals), session)
+            heapq.heappush(self.waiting, entry)
+            if self.holder is not None:
+                self.logger.debug(f"{session.session_id} waits for {self.holder.session_id}")
+                if self.urgent(deadline):
+                    # wake the holder's search, it answers with what it has and hands the engines over.
+                    with self.pool.analysis_ready:
+                        self.pool.analysis_ready.notify_all()
+            self.turn.wait_for(lambda: self.holder is None and self.waiting[0] is entry)
+            heapq.heappop(self.waiting)
+            self.holder, self.holder_deadline = session, deadline
+            stale = self.synced is not session
+            if stale:
+                self.synced = None
+        try:
+            if stale:
+                with self.pool.lock:
+                    # a new number, frames the engines tagged before the sync never match it.
+                    session.generation = next(self.pool.generations)
+                    commands = session.game_state.sync_commands()
+                    for command in commands:
+                        self.pool.broadcast(command, generation=session.generation)
+                    self.synced = session
+            yield len(commands)
+        finally:
+            with self.turn:
+                self.holder = self.holder_deadline = None
+                self.turn.notify_all()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import itertools
+import os
+import socketserver
+import sys
+import threading
+
+from enginePool import EnginePool
+from gameState import split_command
+from gtpPipe import GtpPipe, create_cache, create_telemetry, write_stdout
+from logger import get_logger
+from scheduler import PoolScheduler
+
+logger = get_logger("pipe")
+
+
+class GtpServer:
+    """Many gtp clients in one process, each a GtpPipe session with its own game.
+
+    The sessions share one EnginePool, lent to them turn by turn by a PoolScheduler.
+    """
+
+    def __init__(self, engine_ids=[], local=False) -> None:
+        self.logger = logger
+        self.scheduler = None
+        # engines joining late get the position of the session holding them.
+        self.pool = EnginePool(lambda: self.scheduler.sync_commands())
+        self.scheduler = PoolScheduler(self.pool)
+        self.telemetry = create_telemetry()
+        self.cache = create_cache()
+        self.session_ids = itertools.count(1)
+
+        if local:
+            self.pool.append_engine(str(0))
+        for engine_id in engine_ids:
+            self.pool.append_engine(str(engine_id))
+
+    def serve(self, lines, output, client: str):
+        """Play one game session with commands from lines until quit or the end of input."""
+        session_id = f"{client}#{next(self.session_ids)}"
+        session = GtpPipe(server=self, output=output, session_id=session_id)
+        self.logger.info(f"Session {session_id} started")
+        try:
+            for line in lines:
+                command = line.decode(errors="replace") if isinstance(line, bytes) else line
+                cmd_id, name, _ = split_command(command)
+                if name == "quit":
+                    output(f"={cmd_id or ''}\n\n")
+                    break
+                if name:
+                    session(command)
+        except OSError as e:
+            self.logger.warning(f"Session {session_id} lost its client: {e}")
+        finally:
+            session.close()
+            self.logger.info(f"Session {session_id} ended")
+
+    def listen(self, address: str):
+        """Serve clients on host:port, or on a unix socket when address is a path."""
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                lock = threading.Lock()
+
+                def output(text):
+                    with lock:
+                        try:
+                            self.wfile.write(text.encode())
+                        except OSError:
+                            pass
+
+                client = self.client_address[0] if self.client_address else "unix"
+                server.serve(self.rfile, output, str(client))
+
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            listener = socketserver.ThreadingTCPServer((host, int(port)), Handler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            listener = socketserver.ThreadingUnixStreamServer(address, Handler)
+        listener.daemon_threads = True
+        self.logger.info(f"Listening on {address}")
+        return listener
+
+    def run(self, addresses):
+        """Serve every address, 'stdin' being one session on stdin/stdout."""
+        listeners = [self.listen(address) for address in addresses if address != "stdin"]
+        for listener in listeners:
+            threading.Thread(target=listener.serve_forever, daemon=True).start()
+        if "stdin" in addresses:
+            self.serve(sys.stdin, write_stdout, "stdin")
+        elif listeners:
+            threading.Event().wait()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+from board import COLUMNS
+
+# properties adding or removing stones instead of playing them.
+SETUP_PROPERTIES = ("AB", "AW", "AE")
+
+# kata-set-rules names an sgf RU value may carry.
+KNOWN_RULES = (
+    "tromp-taylor", "chinese", "chinese-ogs", "chinese-kgs", "japanese", "korean", "aga", "new-zealand", "bga",
+)
+
+
+class SgfGame:
+    """Main line of an sgf file, as gtp commands.
+
+    Setup stones of nodes before the first move join the root's, a file adding
+    or removing stones after it is rejected with ValueError.
+    """
+
+    def __init__(self, path: str, properties: dict, nodes: list) -> None:
+        self.path = path
+        self.boardsize = int(properties.get("SZ", ["19"])[0].split(":")[0])
+        komi = properties.get("KM", [""])[0]
+        self.komi = float(komi) if komi else None
+        rules = properties.get("RU", [""])[0].lower().replace(" ", "-")
+        self.rules = rules if rules in KNOWN_RULES else None
+        black = [self.vertex(point) for point in properties.get("AB", [])]
+        white = [self.vertex(point) for point in properties.get("AW", [])]
+        self.moves = []
+        for node in nodes:
+            if any(key in node for key in SETUP_PROPERTIES):
+                if self.moves:
+                    # gtp can only play stones, the position after the setup is out of its reach.
+                    raise ValueError(f"setup stones after move {len(self.moves)}")
+                removed = {self.vertex(point) for point in node.get("AE", [])}
+                black = [v for v in black if v not in removed] + [self.vertex(p) for p in node.get("AB", [])]
+                white = [v for v in white if v not in removed] + [self.vertex(p) for p in node.get("AW", [])]
+            for color in "BW":
+                if color in node:
+                    self.moves.append((color.lower(), self.vertex(node[color][0])))
+        # setup stones, black ones as free handicap.
+        self.setup = []
+        if black:
+            self.setup.append("set_free_handicap " + " ".join(black))
+        self.setup_moves = [("w", vertex) for vertex in white]
+
+    def vertex(self, point: str) -> str:
+        """sgf point to gtp vertex, "" and "tt" on small boards are passes."""
+        if not point or (point == "tt" and self.boardsize <= 19):
+            return "pass"
+        x = ord(point[0]) - ord("a")
+        y = ord(point[1]) - ord("a")
+        return f"{COLUMNS[x]}{self.boardsize - y}"
+
+    def position_commands(self, move_number: int) -> list:
+        """Commands that set up the position before the move with index move_number."""
+        commands = [f"boardsize {self.boardsize}"]
+        if self.komi is not None:
+            commands.append(f"komi {self.komi}")
+        if self.rules is not None:
+            commands.append(f"kata-set-rules {self.rules}")
+        commands.append("clear_board")
+        commands.extend(self.setup)
+        commands.extend(f"play {color} {move}" for color, move in self.setup_moves)
+        commands.extend(f"play {color} {move}" for color, move in self.moves[:move_number])
+        return commands
+
+
+def parse_sgf(text: str):
+    """(root properties, following nodes) of the main line, the first variation at every branch."""
+    nodes = []
+    # [on the main line, variations opened in it] of every open variation.
+    variations = []
+    node = key = None
+    i = text.index("(")
+    while i < len(text):
+        c = text[i]
+        if c == "(":
+            parent = variations[-1] if variations else None
+            main = parent is None or (parent[0] and parent[1] == 0)
+            if parent:
+                parent[1] += 1
+            variations.append([main, 0])
+        elif c == ")":
+            variations.pop()
+            if not variations:
+                break
+        elif c == ";":
+            node = {} if variations[-1][0] else None
+            if node is not None:
+                nodes.append(node)
+        elif c == "[":
+            end = i + 1
+            while text[end] != "]":
+                end += 2 if text[end] == "\\" else 1
+            if node is not None and key:
+                node.setdefault(key, []).append(text[i + 1 : end].replace("\\]", "]"))
+            i = end
+        elif c.isupper():
+            start = i
+            while text[i + 1].isupper():
+                i += 1
+            key = text[start : i + 1]
+        i += 1
+    if not nodes:
+        return {}, []
+    return nodes[0], nodes[1:]
+
+
+def load_sgf(path: str) -> SgfGame:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        properties, nodes = parse_sgf(f.read())
+    return SgfGame(path, properties, nodes)
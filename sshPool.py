@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+from config import config
+from logger import get_logger
+
+logger = get_logger("engine")
+
+pipe_config = config["PIPE"]
+
+
+class HostTimings:
+    """Connection costs of one host, the last ones and how often a transport was reused."""
+
+    def __init__(self) -> None:
+        self.connects = 0
+        self.reuses = 0
+        # seconds for tcp connect, ssh handshake and auth.
+        self.connect_time = None
+        # seconds to open a channel and exec the engine command.
+        self.channel_time = None
+
+    def as_dict(self) -> dict:
+        return {
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "connect_time": self.connect_time,
+            "channel_time": self.channel_time,
+        }
+
+
+class TransportPool:
+    """Authenticated SSH transports per host and user, shared by all engines on a host.
+
+    Engines open their own channel on the pooled transport, so a new engine or a
+    reconnect after a dead engine skips the tcp and ssh handshake.
+    """
+
+    def __init__(self, keepalive: int = 30, compress: bool = False) -> None:
+        self.keepalive = keepalive
+        # zlib on the ssh link, analysis text compresses well on slow links.
+        self.compress = compress
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.clients: dict = {}
+        # one lock per host, so a slow host does not hold up the others.
+        self.host_locks: dict = {}
+        self.timings: dict = {}
+
+    def open_channel(self, host: str, port: int, username: str, password: str, command: str):
+        """Return (transport, channel) running command, connecting only when no live transport exists."""
+        key = (host, port, username)
+        with self.lock:
+            host_lock = self.host_locks.setdefault(key, threading.Lock())
+            timings = self.timings.setdefault(f"{username}@{host}:{port}", HostTimings())
+        with host_lock:
+            transport = self._transport(key, password, timings)
+            start = time.perf_counter()
+            try:
+                channel = transport.open_session(timeout=2)
+            except Exception as e:
+                # the transport died without anyone noticing, connect once more.
+                self.logger.warning(f"Pooled transport to {host} failed: {e}, reconnecting")
+                self.discard(key)
+                transport = self._transport(key, password, timings)
+                start = time.perf_counter()
+                channel = transport.open_session(timeout=2)
+            channel.exec_command(command)
+            timings.channel_time = time.perf_counter() - start
+        self.logger.debug(f"Opened channel on {host} in {timings.channel_time * 1000:.0f}ms")
+        return transport, channel
+
+    def _transport(self, key, password, timings):
+        import paramiko
+
+        client = self.clients.get(key)
+        transport = client.get_transport() if client else None
+        if transport is not None and transport.is_active() and transport.is_authenticated():
+            timings.reuses += 1
+            return transport
+
+        host, port, username = key
+        start = time.perf_counter()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=host,
+            port=port,
+            username=username,
+            password=password,
+            timeout=5,
+            allow_agent=False,
+            look_for_keys=False,
+            compress=self.compress,
+        )
+        transport = client.get_transport()
+        if self.keepalive:
+            transport.set_keepalive(self.keepalive)
+        self.clients[key] = client
+        timings.connects += 1
+        timings.connect_time = time.perf_counter() - start
+        self.logger.info(f"Connected to {host}:{port} in {timings.connect_time:.2f}s")
+        return transport
+
+    def discard(self, key):
+        client = self.clients.pop(key, None)
+        if client:
+            client.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {host: timings.as_dict() for host, timings in self.timings.items()}
+
+
+transport_pool = TransportPool(
+    pipe_config.getint("ssh_keepalive", 30), pipe_config.getboolean("ssh_compress", False)
+)
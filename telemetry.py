@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+from queue import SimpleQueue
+
+from logger import LOG_FOLDER, get_logger, log_filename
+
+logger = get_logger("telemetry")
+
+TELEMETRY_FILE = os.path.expanduser(os.path.join(LOG_FOLDER, f"{log_filename}.jsonl"))
+
+
+class Telemetry:
+    """One JSON line per move, written by a background thread.
+
+    record only queues the dict, so the genmove path never waits on the file.
+    """
+
+    def __init__(self, path: str = TELEMETRY_FILE) -> None:
+        self.path = path
+        self.queue = SimpleQueue()
+        self.logger = logger
+        self.writer_thread = threading.Thread(target=self._writer_thread, daemon=True)
+        self.writer_thread.start()
+
+    def record(self, event: dict):
+        self.queue.put(event)
+
+    def _writer_thread(self):
+        try:
+            f = open(self.path, "a", buffering=1)
+        except OSError as e:
+            self.logger.error(f"Can not open telemetry file {self.path}: {e}")
+            return
+        with f:
+            while True:
+                event = self.queue.get()
+                try:
+                    f.write(json.dumps(event, separators=(",", ":")) + "\n")
+                except (TypeError, ValueError, OSError) as e:
+                    self.logger.error(f"Can not write telemetry {event}: {e}")
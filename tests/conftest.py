@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+
+# logs go to a scratch folder, nothing is written next to the pipe or to shared memory.
+config["LOG"]["log_folder"] = tempfile.mkdtemp(prefix="gopipe-tests-")
+config["LOG"]["telemetry"] = "false"
+config["PIPE"]["cache_file"] = ""
+config["PIPE"]["live_feed"] = ""
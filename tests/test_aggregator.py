@@ -0,0 +1,51 @@
+import pytest
+
+from aggregator import POINT_INDEX, VISITS, MoveAggregator
+from analysis import parse_analysis
+
+
+def analysis(*moves):
+    # (move, visits, winrate, order) of one kata-analyze line.
+    return parse_analysis(
+        " ".join(
+            f"info move {move} visits {visits} winrate {winrate} scoreLead 1.0 order {order} pv {move}"
+            for move, visits, winrate, order in moves
+        )
+    )
+
+
+def test_weights_rank_moves_but_visits_stay_unweighted():
+    aggregator = MoveAggregator()
+    aggregator.update("1", analysis(("D4", 100, 0.6, 0), ("Q16", 50, 0.5, 1)), weight=2.0)
+    aggregator.update("2", analysis(("Q16", 100, 0.4, 0)), weight=1.0)
+    assert aggregator.total_visits == 250
+    assert aggregator.engine_visits("1") == 150
+    assert aggregator.visits[POINT_INDEX["Q16"]] == 150
+    assert aggregator.total[VISITS, POINT_INDEX["Q16"]] == 200
+    assert aggregator.leading_visits() == (150, 100)
+
+
+def test_update_replaces_the_engine_contribution():
+    aggregator = MoveAggregator()
+    aggregator.update("1", analysis(("D4", 100, 0.6, 0)))
+    aggregator.update("1", analysis(("D4", 300, 0.5, 0)))
+    assert aggregator.total_visits == 300
+
+
+def test_best_is_the_lowest_average_order_with_its_averages():
+    aggregator = MoveAggregator()
+    aggregator.update("1", analysis(("D4", 100, 0.6, 0), ("Q16", 200, 0.5, 1)))
+    aggregator.update("2", analysis(("D4", 100, 0.4, 0)))
+    move, winrate, scoreLead = aggregator.best()
+    assert move == "D4"
+    assert winrate == pytest.approx(0.5)
+    assert scoreLead == pytest.approx(1.0)
+
+
+def test_best_of_nothing():
+    aggregator = MoveAggregator()
+    assert aggregator.best() == (None, None, None)
+    assert aggregator.engine_best("1") == (None, None, None)
+    aggregator.update("1", analysis(("D4", 10, 0.5, 0)))
+    aggregator.reset()
+    assert aggregator.total_visits == 0
@@ -0,0 +1,24 @@
+from analysis import parse_analysis, parse_move_infos
+
+LINE = (
+    "info move D4 visits 120 edgeVisits 120 winrate 0.55 scoreLead 1.5 order 0 pv D4 Q16 D16 "
+    "info move Q16 visits 30 winrate 0.52 scoreLead 0.5 order 1 pv Q16 D4"
+)
+
+
+def test_parse_analysis_reads_every_move_and_skips_the_pv():
+    infos = parse_analysis(LINE)
+    assert list(infos) == ["D4", "Q16"]
+    d4 = infos["D4"]
+    assert (d4.visits, d4.winrate, d4.scoreLead, d4.order) == (120, 0.55, 1.5, 0)
+    assert infos["Q16"].visits == 30
+
+
+def test_parse_analysis_of_a_line_without_moves():
+    assert parse_analysis("") == {}
+
+
+def test_parse_move_infos_flips_to_the_other_side():
+    infos = parse_move_infos([{"move": "D4", "visits": 10, "winrate": 0.7, "scoreLead": 3.0, "order": 0}], flip=True)
+    assert infos["D4"].winrate == 1 - 0.7
+    assert infos["D4"].scoreLead == -3.0
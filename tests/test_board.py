@@ -0,0 +1,68 @@
+import pytest
+
+from board import Board, parse_vertex
+
+
+def test_capture_in_the_corner():
+    board = Board(9)
+    board.play("b", "A1")
+    board.play("w", "B1")
+    board.play("w", "A2")
+    assert parse_vertex("A1", 9) not in board.stones
+
+
+def test_capture_of_a_group():
+    board = Board(9)
+    for color, vertex in [("b", "E5"), ("b", "E6"), ("w", "E4"), ("w", "D5"), ("w", "D6"), ("w", "F5"), ("w", "F6")]:
+        board.play(color, vertex)
+    assert len(board.stones) == 7
+    board.play("w", "E7")
+    assert parse_vertex("E5", 9) not in board.stones
+    assert parse_vertex("E6", 9) not in board.stones
+    assert len(board.stones) == 6
+
+
+def test_capture_before_suicide_check():
+    # white fills its own last liberty, but takes the black stone first.
+    board = Board(9)
+    for color, vertex in [("b", "B1"), ("w", "C1"), ("w", "B2"), ("b", "A2")]:
+        board.play(color, vertex)
+    board.play("w", "A1")
+    assert parse_vertex("B1", 9) not in board.stones
+    assert board.stones[parse_vertex("A1", 9)] == "w"
+
+
+def test_hash_forgets_captured_stones():
+    board = Board(9)
+    for color, vertex in [("b", "A1"), ("w", "B1"), ("w", "A2")]:
+        board.play(color, vertex)
+    same = Board(9)
+    for color, vertex in [("w", "B1"), ("w", "A2")]:
+        same.play(color, vertex)
+    assert board.position_hash("b") == same.position_hash("b")
+    assert board.position_hash("b") != board.position_hash("w")
+
+
+def test_off_board_vertex():
+    with pytest.raises(ValueError):
+        Board(9).play("b", "K10")
+
+
+KO = [("b", "D5"), ("b", "C4"), ("b", "D3"), ("w", "E5"), ("w", "F4"), ("w", "E3"), ("b", "E4"), ("w", "D4")]
+
+
+def test_single_stone_retake_is_a_ko():
+    board = Board(9)
+    for color, vertex in KO:
+        board.play(color, vertex)
+    # white took E4, black may not take D4 back at once.
+    assert board.ko == parse_vertex("E4", 9)
+    board.play("b", "pass")
+    assert board.ko is None
+
+
+def test_capture_of_two_stones_is_no_ko():
+    board = Board(9)
+    for color, vertex in [("b", "A1"), ("b", "B1"), ("w", "C1"), ("w", "A2"), ("w", "B2")]:
+        board.play(color, vertex)
+    assert board.ko is None
@@ -0,0 +1,42 @@
+import threading
+
+from commandQueue import CommandQueue
+
+
+def test_analysis_request_is_merged_away_by_the_next_command():
+    queue = CommandQueue()
+    queue.put("1 kata-analyze b 50")
+    queue.put("2 kata-analyze b 50")
+    queue.put("3 play b D4")
+    assert queue.get_batch_nowait() == ["3 play b D4"]
+    assert queue.merged == 2
+
+
+def test_plays_are_taken_in_one_batch():
+    queue = CommandQueue()
+    for command in ["play b D4", "play w Q16", "komi 6.5", "play b C3"]:
+        queue.put(command)
+    assert queue.depth == 4
+    assert queue.get_batch_nowait() == ["play b D4", "play w Q16"]
+    assert queue.get_batch_nowait() == ["komi 6.5"]
+    assert queue.get_batch_nowait() == ["play b C3"]
+    assert queue.get_batch_nowait() == []
+
+
+def test_last_analysis_request_stays():
+    queue = CommandQueue()
+    queue.put("play b D4")
+    queue.put("kata-analyze w 50")
+    assert queue.get_batch_nowait() == ["play b D4"]
+    assert queue.get_batch_nowait() == ["kata-analyze w 50"]
+
+
+def test_close_wakes_a_waiting_get_batch():
+    queue = CommandQueue()
+    batches = []
+    waiter = threading.Thread(target=lambda: batches.append(queue.get_batch()))
+    waiter.start()
+    queue.close()
+    waiter.join(1)
+    assert not waiter.is_alive()
+    assert batches == [[]]
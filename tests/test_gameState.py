@@ -0,0 +1,52 @@
+from gameState import GameState
+
+
+def test_sync_commands_replays_settings_before_the_moves():
+    state = GameState()
+    for command in [
+        "1 boardsize 13",
+        "komi 6.5",
+        "kata-set-param playoutDoublingAdvantage 1",
+        "kata-set-param playoutDoublingAdvantage 0",
+        "set_free_handicap D4 K10",
+        "play w C3",
+        "play b resign",
+    ]:
+        state.update(command)
+    assert state.sync_commands() == [
+        "boardsize 13",
+        "komi 6.5",
+        "kata-set-param playoutDoublingAdvantage 0",
+        "clear_board",
+        "set_free_handicap D4 K10",
+        "play w C3",
+    ]
+
+
+def test_sync_commands_after_undo_and_clear_board():
+    state = GameState()
+    for command in ["komi 7.5", "play b D4", "play w Q16", "undo"]:
+        state.update(command)
+    assert state.sync_commands()[-1] == "play b D4"
+    state.update("clear_board")
+    assert state.sync_commands() == ["boardsize 19", "komi 7.5", "clear_board"]
+
+
+def test_kata_set_rules_drops_single_rules():
+    state = GameState()
+    state.update("kata-set-rule ko simple")
+    state.update("kata-set-rules japanese")
+    assert state.sync_commands() == ["boardsize 19", "kata-set-rules japanese", "clear_board"]
+
+
+def test_position_key_tells_a_pending_ko_apart():
+    moves = ["b D5", "b C4", "b D3", "w E5", "w F4", "w E3", "b E4", "w D4"]
+    ko = GameState()
+    for move in moves:
+        ko.update(f"play {move}")
+    # the same stones, reached without the capture.
+    settled = GameState()
+    for move in ["b D5", "b C4", "b D3", "w E5", "w F4", "w E3", "w D4"]:
+        settled.update(f"play {move}")
+    assert ko.position_key("b") != settled.position_key("b")
+    assert ko.position_key("b").endswith("/ko E4")
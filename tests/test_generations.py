@@ -0,0 +1,39 @@
+import types
+
+from server import GtpServer
+from gtpPipe import GtpPipe
+
+
+def session(server, session_id):
+    pipe = GtpPipe(server=server, output=lambda text: None, session_id=session_id)
+    pipe.analysis = {}
+    return pipe
+
+
+def frame(generation):
+    # an engine reporting analysis of the position generation.
+    return types.SimpleNamespace(engine_id="1", analysis={"D4": None}, analysis_generation=generation)
+
+
+def test_sessions_never_share_a_generation():
+    server = GtpServer()
+    a, b = session(server, "a"), session(server, "b")
+    a.dealing_with_command("1 play b D4")
+    b.dealing_with_command("1 play b Q16")
+    assert a.generation != b.generation
+
+    engine = frame(a.generation)
+    server.pool.engines.append(engine)
+    assert a.fresh_analysis_engines() == [engine]
+    assert b.fresh_analysis_engines() == []
+
+
+def test_sync_takes_a_new_generation():
+    server = GtpServer()
+    a, b = session(server, "a"), session(server, "b")
+    a.dealing_with_command("1 play b D4")
+    before = a.generation
+    server.pool.engines.append(frame(before))
+    with server.scheduler.use(a, 0):
+        assert a.generation not in (before, b.generation)
+        assert a.fresh_analysis_engines() == []
@@ -0,0 +1,40 @@
+import mergeStrategy
+from aggregator import MoveAggregator
+from mergeStrategy import MIN_TRUST, create_merge_strategy
+
+from test_aggregator import analysis
+
+
+def test_unknown_strategy_falls_back_to_equal():
+    assert type(create_merge_strategy("nope")) is mergeStrategy.MergeStrategy
+    assert create_merge_strategy("equal").weight("1") == 1.0
+
+
+def test_weighted_reads_the_weights_section(monkeypatch):
+    monkeypatch.setattr(mergeStrategy, "weight_config", {"1": "2.5"})
+    strategy = create_merge_strategy("weighted")
+    assert strategy.weight("1") == 2.5
+    assert strategy.weight("2") == 1.0
+
+
+def test_converged_when_every_engine_agrees_with_enough_visits():
+    strategy = create_merge_strategy("equal")
+    aggregator = MoveAggregator()
+    aggregator.update("1", analysis(("D4", 100, 0.6, 0)))
+    aggregator.update("2", analysis(("D4", 100, 0.6, 0)))
+    assert not strategy.converged(aggregator)
+    strategy.converge_visits = 100
+    assert strategy.converged(aggregator)
+    aggregator.update("2", analysis(("Q16", 100, 0.6, 0)))
+    assert not strategy.converged(aggregator)
+
+
+def test_trust_drops_for_engines_that_disagree():
+    strategy = create_merge_strategy("trust")
+    aggregator = MoveAggregator()
+    aggregator.update("1", analysis(("D4", 100, 0.6, 0)))
+    aggregator.update("2", analysis(("Q16", 100, 0.6, 0)))
+    for _ in range(50):
+        strategy.end_turn(aggregator, "D4")
+    assert strategy.weight("1") == 1.0
+    assert MIN_TRUST <= strategy.weight("2") < 0.3
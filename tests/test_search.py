@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import pytest
+
+from fakeEngines import FakeRemoteEngine
+from fakeKatago import HANDICAP
+from gtpPipe import GtpPipe
+
+
+@pytest.fixture
+def pipe():
+    """A pipe on one fake remote engine, and the responses it wrote."""
+    # the fake replays benchmarks/data/kata_analyze.txt, whose best move is M10.
+    output = []
+    pipe = GtpPipe([], local=False, output=output.append)
+    pipe.pool.create_engine = lambda engine_id: FakeRemoteEngine(engine_id)
+    pipe.pool.append_engine("1")
+    deadline = time.time() + 10
+    while not pipe.pool.engines and time.time() < deadline:
+        time.sleep(0.05)
+    assert pipe.pool.engines
+    yield pipe, output
+    pipe.pool.stop_engine("1")
+
+
+def test_genmove_plays_the_merged_best_move(pipe):
+    pipe, output = pipe
+    for command in ["1 boardsize 19", "2 clear_board", "3 set_top_visits 2000", "4 genmove b"]:
+        pipe.dealing_with_command(command)
+    assert output[-1] == "=4 M10\n\n"
+    assert pipe.game_state.moves[-1] == ("b", "M10")
+
+
+@pytest.mark.parametrize("top_visits", [0, 5])
+def test_genmove_with_a_tiny_budget_waits_for_analysis(pipe, top_visits):
+    pipe, output = pipe
+    for command in ["1 clear_board", f"2 set_top_visits {top_visits}", "3 genmove b"]:
+        pipe.dealing_with_command(command)
+    assert output[-1] == "=3 M10\n\n"
+
+
+def test_place_free_handicap_answers_the_vertices(pipe):
+    pipe, output = pipe
+    pipe.dealing_with_command("1 clear_board")
+    pipe.dealing_with_command("2 place_free_handicap 3")
+    assert output[-1] == f"=2 {' '.join(HANDICAP[:3])}\n\n"
@@ -0,0 +1,44 @@
+import pytest
+
+from sgf import SgfGame, parse_sgf
+
+
+def game(text: str) -> SgfGame:
+    properties, nodes = parse_sgf(text)
+    return SgfGame("test.sgf", properties, nodes)
+
+
+def test_main_line_takes_the_first_variation():
+    properties, nodes = parse_sgf("(;SZ[9]KM[6.5];B[ee](;W[cc];B[gg])(;W[gc]))")
+    assert properties == {"SZ": ["9"], "KM": ["6.5"]}
+    assert [node for node in nodes] == [{"B": ["ee"]}, {"W": ["cc"]}, {"B": ["gg"]}]
+
+
+def test_escaped_bracket_in_a_comment():
+    properties, nodes = parse_sgf("(;C[a \\] b]SZ[19];B[pd])")
+    assert properties["C"] == ["a ] b"]
+    assert nodes == [{"B": ["pd"]}]
+
+
+def test_position_commands():
+    sgf = game("(;SZ[9]KM[7]RU[Japanese]AB[cc][gg];W[ee];B[tt];W[])")
+    assert sgf.moves == [("w", "E5"), ("b", "pass"), ("w", "pass")]
+    assert sgf.position_commands(1) == [
+        "boardsize 9",
+        "komi 7.0",
+        "kata-set-rules japanese",
+        "clear_board",
+        "set_free_handicap C7 G3",
+        "play w E5",
+    ]
+
+
+def test_setup_before_the_first_move_joins_the_root():
+    sgf = game("(;SZ[9]AB[aa][bb];AE[aa]AW[cc];B[dd])")
+    assert sgf.setup == ["set_free_handicap B8"]
+    assert sgf.setup_moves == [("w", "C7")]
+
+
+def test_setup_after_a_move_is_rejected():
+    with pytest.raises(ValueError):
+        game("(;SZ[9];B[dd];AB[aa];W[ee])")
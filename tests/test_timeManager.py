@@ -0,0 +1,32 @@
+import time
+
+from timeManager import TimeManager
+
+
+def test_small_budget_keeps_at_least_one_visit():
+    manager = TimeManager()
+    _, max_visits = manager.plan("b", 0, 5)
+    assert max_visits == 1
+    _, max_visits = manager.plan("b", 100, 2, winrate=0.99, scoreLead=40)
+    assert max_visits == 1
+
+
+def test_opening_and_decided_positions_get_smaller_budgets():
+    manager = TimeManager()
+    _, opening = manager.plan("b", 0, 1000)
+    _, close = manager.plan("b", 100, 1000, winrate=0.5, scoreLead=0)
+    _, decided = manager.plan("b", 100, 1000, winrate=0.95, scoreLead=20)
+    assert opening == 100
+    assert close == 1000
+    assert decided < close
+
+
+def test_unbeatable_needs_a_share_of_the_budget_and_a_known_speed():
+    manager = TimeManager()
+    deadline = time.time() + 1
+    assert not manager.unbeatable(900, 10, 950, 1000, deadline)
+    manager.rates["1"] = 100
+    assert not manager.unbeatable(90, 10, 100, 1000, deadline)
+    assert manager.unbeatable(900, 10, 950, 1000, deadline)
+    # the runner-up can still catch up in the second left.
+    assert not manager.unbeatable(500, 450, 800, 1000, deadline)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import time
+
+from config import config
+
+pipe_config = config["PIPE"]
+
+# think time per move before any time_settings arrive.
+DEFAULT_MOVE_TIME = 13
+MIN_MOVE_TIME = 0.5
+# main time is spread over this many of our moves, never fewer than MIN_MOVES_LEFT.
+EXPECTED_MOVES = 120
+MIN_MOVES_LEFT = 20
+OPENING_MOVES = 10
+# scoreLead at which a position counts as decided.
+DECIDED_SCORE = 15
+# share of the visit budget searched before an early stop is considered.
+MIN_SEARCH_SHARE = 0.2
+
+
+class TimeManager:
+    """Per-move time and visit budgets from the clock, the position and engine speed."""
+
+    def __init__(self) -> None:
+        self.base_lag_buffer = pipe_config.getfloat("lag_buffer", 1)
+        self.min_visit_factor = pipe_config.getfloat("min_visit_factor", 0.3)
+        self.main_time = 0.0
+        self.byo_yomi = None
+        self.byo_stones = 0
+        # visits/sec per engine, kept across turns and games.
+        self.rates: dict = {}
+        self.turn_frames: dict = {}
+        self.new_game()
+
+    def new_game(self):
+        self.lag_buffer = self.base_lag_buffer
+        self.time_left: dict = {}
+
+    def set_time_settings(self, main_time: float, byo_yomi: float, byo_stones: int):
+        self.main_time = float(main_time)
+        self.byo_yomi = float(byo_yomi)
+        self.byo_stones = int(byo_stones)
+        self.time_left = {}
+
+    def set_time_left(self, color: str, seconds: float, stones: int):
+        self.time_left[color.lower()[0]] = (float(seconds), int(stones))
+
+    def in_byo_yomi(self, color: str) -> bool:
+        left = self.time_left.get(color.lower()[0])
+        if left is None:
+            return self.main_time == 0
+        return left[1] > 0
+
+    def available_time(self, color: str, move_number: int) -> float:
+        """Seconds this move may take before the clock runs out."""
+        byo_yomi = self.byo_yomi if self.byo_yomi else DEFAULT_MOVE_TIME
+        left = self.time_left.get(color.lower()[0])
+        if left is None:
+            if not self.main_time:
+                return byo_yomi
+            left = (self.main_time, 0)
+        seconds, stones = left
+        if stones > 0:
+            return seconds / stones
+        moves_left = max(MIN_MOVES_LEFT, EXPECTED_MOVES - move_number / 2)
+        # byo-yomi is still there after main time runs out.
+        return seconds / moves_left + (self.byo_yomi or 0)
+
+    def visit_factor(self, winrate, scoreLead) -> float:
+        """1 for close positions, down to min_visit_factor for decided ones."""
+        if winrate is None or scoreLead is None:
+            return 1.0
+        decided = max(abs(winrate - 0.5) * 2, min(abs(scoreLead) / DECIDED_SCORE, 1))
+        return 1 - decided * (1 - self.min_visit_factor)
+
+    def plan(self, color: str, move_number: int, top_visits: int, winrate=None, scoreLead=None):
+        """Return (max_time, max_visits) for the coming genmove."""
+        factor = self.visit_factor(winrate, scoreLead)
+        if move_number < OPENING_MOVES:
+            factor = min(factor, 0.1)
+        # a budget of 0 would end the search before any analysis arrives.
+        max_visits = max(int(top_visits * factor), 1)
+
+        max_time = self.available_time(color, move_number)
+        # unused byo-yomi is lost, unused main time is not.
+        if not self.in_byo_yomi(color):
+            max_time *= max(factor, self.min_visit_factor)
+        return max(max_time - self.lag_buffer, MIN_MOVE_TIME), max_visits
+
+    def start_turn(self):
+        self.turn_frames = {}
+
+    def record(self, engine_id: str, visits: int, now=None):
+        """Update the visits/sec of engine_id from the total visits of its latest analysis."""
+        now = time.time() if now is None else now
+        first = self.turn_frames.setdefault(engine_id, (now, visits))
+        if now > first[0] and visits > first[1]:
+            self.rates[engine_id] = (visits - first[1]) / (now - first[0])
+
+    @property
+    def visits_per_second(self) -> float:
+        engines = self.turn_frames or self.rates
+        return sum(self.rates.get(engine_id, 0) for engine_id in engines)
+
+    def unbeatable(self, best: int, second: int, total_visits: int, max_visits: int, deadline: float) -> bool:
+        """True when the runner-up can not catch up with the best move in the time left."""
+        if total_visits < max_visits * MIN_SEARCH_SHARE or not self.visits_per_second:
+            return False
+        remaining = min(
+            self.visits_per_second * max(deadline - time.time(), 0),
+            max_visits - total_visits,
+        )
+        return best - second > remaining